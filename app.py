@@ -4,6 +4,9 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
 import os
+from backends import backend_key, connect
+from query_builder import not_null, opco_filters, select
+from result_cache import cached_query
 
 # Detect if running in Snowflake (SiS) or locally
 RUNNING_IN_SNOWFLAKE = os.environ.get("SNOWFLAKE_ACCOUNT") is not None
@@ -194,13 +197,21 @@ PLOTLY_LAYOUT = dict(
 
 # ============== SNOWFLAKE CONNECTION ==============
 def get_connection():
-    """Get Snowflake connection - works both in SiS and locally"""
-    return st.connection("snowflake")
+    """Get the query backend - Snowflake in SiS and locally, or DuckDB (FANGRAPH_BACKEND)"""
+    return connect()
 
-def run_query(query):
-    """Execute query and return pandas DataFrame"""
-    conn = get_connection()
-    return conn.query(query, ttl=600)  # Cache for 10 minutes
+@st.cache_data(ttl=600, show_spinner=False)
+def query_with_ttl(query, params, backend):
+    """Execute query in a 10-minute in-memory cache - what st.connection's ``ttl=600`` gave before"""
+    return get_connection().query(query, params=list(params))
+
+def run_query(query, params=()):
+    """Execute query (with ``?`` bind parameters) and return pandas DataFrame"""
+    params = tuple(params)
+    # Disk cache shared across restarts and replicas, then the in-memory ttl cache
+    return cached_query(
+        lambda sql: query_with_ttl(sql, params, backend_key()), query, (backend_key(), *params)
+    )
 
 # ============== DATA QUERIES ==============
 @st.cache_data(ttl=3600, show_spinner="Fetching data from Snowflake...")
@@ -336,36 +347,23 @@ def get_geo_data():
 @st.cache_data(ttl=3600, show_spinner="Fetching filtered data...")
 def get_opco_filtered_stats(opco: str):
     """Get stats filtered by OpCo"""
-    if opco == "ALL":
-        filter_clause = "1=1"
-    else:
-        opco_filters = {
-            "Commerce": "COMMERCE_FAN_INDICATOR = TRUE",
-            "Topps Digital": "TOPPS_DIGITAL_FAN_INDICATOR = TRUE",
-            "Topps.com": "TOPPS_COM_FAN_INDICATOR = TRUE",
-            "FBG (Sportsbook)": "FBG_FAN_INDICATOR = TRUE",
-            "FanApp": "FANAPP_FAN_INDICATOR = TRUE",
-            "Live": "LIVE_FAN_INDICATOR = TRUE",
-            "Collect": "COLLECT_FAN_INDICATOR = TRUE",
-            "Events": "EVENTS_FAN_INDICATOR = TRUE"
-        }
-        filter_clause = opco_filters.get(opco, "1=1")
+    # Same SQL text for every OpCo - the OpCo label itself is the bind parameter
+    filters = opco_filters(opco)
     
     # Total fans for this OpCo
-    total_query = f"SELECT COUNT(*) as CNT FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}"
-    total = run_query(total_query)['CNT'].iloc[0]
+    total_query = select("FANGRAPH.ADMIN.FANGRAPH", measures={"CNT": "COUNT(*)"}, filters=filters)
+    total = run_query(*total_query)['CNT'].iloc[0]
     
     # League breakdown for this OpCo - optimized single scan
-    league_query = f"""
-    SELECT 
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NFL = TRUE THEN 1 ELSE 0 END) as NFL,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_MLB = TRUE THEN 1 ELSE 0 END) as MLB,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NBA = TRUE THEN 1 ELSE 0 END) as NBA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NCAA = TRUE THEN 1 ELSE 0 END) as NCAA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NHL = TRUE THEN 1 ELSE 0 END) as NHL
-    FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}
-    """
-    result = run_query(league_query).iloc[0]
+    league_query = select(
+        "FANGRAPH.ADMIN.FANGRAPH",
+        measures={
+            league: f"SUM(CASE WHEN FANGRAPH_PREFERENCE_{league} = TRUE THEN 1 ELSE 0 END)"
+            for league in ("NFL", "MLB", "NBA", "NCAA", "NHL")
+        },
+        filters=filters,
+    )
+    result = run_query(*league_query).iloc[0]
     leagues_df = pd.DataFrame([
         {'LEAGUE': 'NFL', 'FAN_COUNT': result['NFL']},
         {'LEAGUE': 'MLB', 'FAN_COUNT': result['MLB']},
@@ -375,16 +373,14 @@ def get_opco_filtered_stats(opco: str):
     ]).sort_values('FAN_COUNT', ascending=False)
     
     # Age breakdown for this OpCo
-    age_query = f"""
-    SELECT 
-        FANGRAPH_AGE_RANGE as AGE_RANGE,
-        COUNT(*) as FAN_COUNT
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    WHERE {filter_clause} AND FANGRAPH_AGE_RANGE IS NOT NULL
-    GROUP BY FANGRAPH_AGE_RANGE
-    ORDER BY FAN_COUNT DESC
-    """
-    age_df = run_query(age_query)
+    age_query = select(
+        "FANGRAPH.ADMIN.FANGRAPH",
+        measures={"FAN_COUNT": "COUNT(*)"},
+        dimensions={"AGE_RANGE": "FANGRAPH_AGE_RANGE"},
+        filters=[*filters, not_null("FANGRAPH_AGE_RANGE")],
+        order_by=["FAN_COUNT DESC"],
+    )
+    age_df = run_query(*age_query)
     
     return {
         'total': total,
@@ -0,0 +1,228 @@
+"""Pluggable query backends behind get_connection/run_query.
+
+FANGRAPH_BACKEND selects where dashboard SQL runs:
+
+- ``snowflake`` (default): ``st.connection("snowflake")``, in SiS or locally.
+- ``duckdb``: an embedded DuckDB file (FANGRAPH_DUCKDB_PATH) built by
+  ``generate_synthetic_data.py``, so the app can be run and benchmarked
+  offline without a Snowflake account.
+
+FANGRAPH_QUERY_LATENCY adds an artificial per-query delay (seconds) to any
+backend, to mimic warehouse round trips when measuring locally.
+
+Results cross from the backend as Arrow: ``query`` converts one Arrow table
+to pandas column by column (no per-row Python objects), and
+``arrow_batches`` streams a large result as record batches so it never has
+to be materialized at once.
+"""
+import functools
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import streamlit as st
+
+from query_batch import LatencyConnection
+
+BACKEND = os.environ.get("FANGRAPH_BACKEND", "snowflake").lower()
+DUCKDB_PATH = os.environ.get("FANGRAPH_DUCKDB_PATH", "fangraph.duckdb")
+QUERY_LATENCY = float(os.environ.get("FANGRAPH_QUERY_LATENCY", "0"))
+
+# Snowflake functions the dashboard SQL uses that DuckDB lacks
+DUCKDB_MACROS = [
+    """CREATE MACRO dateadd(part, n, d) AS CASE lower(part)
+        WHEN 'year' THEN d + to_years(n)
+        WHEN 'month' THEN d + to_months(n)
+        WHEN 'day' THEN d + to_days(n)
+    END""",
+    "CREATE MACRO iff(cond, a, b) AS CASE WHEN cond THEN a ELSE b END",
+]
+
+# Rows per record batch for streamed results
+BATCH_ROWS = 100_000
+
+FLATTEN_PATTERN = re.compile(r"LATERAL\s+FLATTEN\s*\(\s*input\s*=>\s*([\w.]+)\s*\)\s+(\w+)", re.IGNORECASE)
+ARRAY_FLATTEN_PATTERN = re.compile(
+    r"LATERAL\s+FLATTEN\s*\(\s*input\s*=>\s*ARRAY_CONSTRUCT\(([\w.,\s]+)\)\s*\)\s+(\w+)", re.IGNORECASE
+)
+ARRAY_CONTAINS_PATTERN = re.compile(r"ARRAY_CONTAINS\(\s*\?::VARIANT\s*,\s*([\w.]+)\s*\)", re.IGNORECASE)
+
+
+def _flatten_array(match):
+    """FLATTEN of ARRAY_CONSTRUCT(a, b, ...) as a DuckDB unnest with FLATTEN's VALUE and 0-based INDEX"""
+    items = [item.strip() for item in match.group(1).split(",")]
+    return (
+        f"LATERAL (SELECT unnest([{', '.join(items)}]) AS value, unnest(range({len(items)})) AS index) {match.group(2)}"
+    )
+
+
+def translate_sql(sql):
+    """Rewrite the Snowflake-only syntax the dashboard uses into DuckDB SQL"""
+    sql = ARRAY_CONTAINS_PATTERN.sub(r"list_contains(\1, ?)", sql)
+    sql = ARRAY_FLATTEN_PATTERN.sub(_flatten_array, sql)
+    return FLATTEN_PATTERN.sub(r"LATERAL (SELECT unnest(\1) AS value) \2", sql)
+
+
+def _frame_type(field, column):
+    """Arrow type a result column is converted through on its way to pandas"""
+    if not pa.types.is_decimal(field.type):
+        return field.type
+    if field.type.scale > 0:
+        return pa.float64()
+    try:
+        # Integer NUMBER columns (counts, sums, IDs) stay exact
+        pc.cast(column, pa.int64())
+    except pa.ArrowInvalid:
+        # Wider than int64 (e.g. NUMBER(38) IDs): keep exact Decimal values
+        return field.type
+    return pa.int64()
+
+
+def arrow_to_frame(table):
+    """Convert an Arrow table to pandas, releasing Arrow buffers as columns are converted.
+
+    DECIMAL columns with a scale (Snowflake NUMBER(p, s)) become float64 in
+    Arrow rather than object columns of ``decimal.Decimal``. Integer DECIMAL
+    columns become int64 when every value fits, and otherwise keep their
+    exact Decimal values.
+    """
+    schema = pa.schema([field.with_type(_frame_type(field, table.column(i))) for i, field in enumerate(table.schema)])
+    if schema != table.schema:
+        table = table.cast(schema)
+    return table.to_pandas(split_blocks=True, self_destruct=True)
+
+
+class DuckDBConnection:
+    """Embedded DuckDB stand-in exposing the same ``query`` call as st.connection"""
+
+    def __init__(self, path):
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise ImportError("FANGRAPH_BACKEND=duckdb needs the duckdb package: pip install duckdb") from exc
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found - build it with: python generate_synthetic_data.py --out {path}")
+        self.path = path
+        self._db = duckdb.connect()
+        # Attach as FANGRAPH so FANGRAPH.<SCHEMA>.<TABLE> names resolve unchanged
+        self._db.execute(f"ATTACH '{path}' AS fangraph (READ_ONLY)")
+        for macro in DUCKDB_MACROS:
+            self._db.execute(macro)
+        self._db.execute("USE fangraph")
+
+    def _reader(self, sql, params, batch_rows):
+        # One cursor per call - DuckDB connections are not shared across threads
+        result = self._db.cursor().execute(translate_sql(sql), params or None)
+        if hasattr(result, "to_arrow_reader"):
+            return result.to_arrow_reader(batch_rows)
+        return result.fetch_record_batch(batch_rows)
+
+    def query(self, sql, params=None, **kwargs):
+        """Execute SQL (with optional ``?`` parameters) and return a DataFrame with Snowflake-style upper-case columns"""
+        table = self._reader(sql, params, BATCH_ROWS).read_all()
+        return arrow_to_frame(table.rename_columns([col.upper() for col in table.column_names]))
+
+    def arrow_batches(self, sql, params=None, batch_rows=BATCH_ROWS):
+        """Yield the result as Arrow record batches of up to ``batch_rows`` rows"""
+        for batch in self._reader(sql, params, batch_rows):
+            yield batch.rename_columns([col.upper() for col in batch.schema.names])
+
+
+class SnowflakeConnection:
+    """st.connection("snowflake") queried through a cursor so the Snowflake query id is kept.
+
+    Results are not cached here - the dashboard getters own caching - so
+    ``ttl`` and other st.connection keyword arguments are accepted and ignored.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def query(self, sql, params=None, **kwargs):
+        """Execute SQL (with optional ``?`` parameters) and return a DataFrame with ``attrs["query_id"]`` set"""
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(sql, params or None)
+            table = cursor.fetch_arrow_all()
+            if table is None:
+                # No rows: the connector returns no table at all
+                df = pd.DataFrame(columns=[column.name for column in cursor.description])
+            else:
+                df = arrow_to_frame(table)
+            df.attrs["query_id"] = cursor.sfqid
+        finally:
+            cursor.close()
+        return df
+
+    def arrow_batches(self, sql, params=None, batch_rows=BATCH_ROWS):
+        """Yield the result as Arrow tables, one per Snowflake result chunk.
+
+        Chunk sizes are chosen by Snowflake, so ``batch_rows`` is not applied.
+        """
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(sql, params or None)
+            yield from cursor.fetch_arrow_batches()
+        finally:
+            cursor.close()
+
+
+@functools.lru_cache(maxsize=None)
+def _duckdb_connection(path):
+    return DuckDBConnection(path)
+
+
+def backend_key(backend=None):
+    """Identifies which data a query runs against - part of shared result cache keys"""
+    backend = (backend or BACKEND).lower()
+    if backend == "duckdb":
+        return f"duckdb:{os.path.abspath(DUCKDB_PATH)}"
+    return backend
+
+
+def source_versions(conn, tables, backend=None):
+    """Epoch seconds each ``DB.SCHEMA.TABLE`` in ``tables`` was last altered.
+
+    Snowflake reports LAST_ALTERED per table; a DuckDB file only has one
+    modification time, shared by all of its tables.
+    """
+    backend = (backend or BACKEND).lower()
+    if not tables:
+        return {}
+    if backend == "duckdb":
+        mtime = os.path.getmtime(DUCKDB_PATH)
+        return {table: mtime for table in tables}
+    versions = {}
+    by_database = {}
+    for table in tables:
+        database, name = table.split(".", 1)
+        by_database.setdefault(database, []).append(name)
+    for database, names in by_database.items():
+        listed = ", ".join(f"'{name}'" for name in sorted(names))
+        df = conn.query(f"""
+        SELECT TABLE_SCHEMA || '.' || TABLE_NAME as NAME, DATE_PART(EPOCH_SECOND, LAST_ALTERED) as LAST_ALTERED
+        FROM {database}.INFORMATION_SCHEMA.TABLES
+        WHERE TABLE_SCHEMA || '.' || TABLE_NAME IN ({listed})
+        """)
+        for name, altered in zip(df['NAME'], df['LAST_ALTERED']):
+            versions[f"{database}.{name}"] = float(altered)
+    return versions
+
+
+def connect(backend=None):
+    """Open the configured backend and return an object with ``query(sql)``"""
+    backend = (backend or BACKEND).lower()
+    if backend == "duckdb":
+        conn = _duckdb_connection(DUCKDB_PATH)
+    elif backend == "snowflake":
+        import snowflake.connector
+        # Server-side binding of the ``?`` parameters query_builder emits
+        snowflake.connector.paramstyle = "qmark"
+        conn = SnowflakeConnection(st.connection("snowflake"))
+    else:
+        raise ValueError(f"Unknown FANGRAPH_BACKEND {backend!r} - expected 'snowflake' or 'duckdb'")
+    if QUERY_LATENCY > 0:
+        conn = LatencyConnection(conn.query, latency=QUERY_LATENCY, delegate=conn)
+    return conn
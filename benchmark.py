@@ -0,0 +1,358 @@
+"""Benchmark the dashboard data functions and full-page renders.
+
+Drives every ``get_*`` function in ``streamlit_app.py`` and a headless
+Streamlit ``AppTest`` render of each tab, cold (caches cleared) and warm,
+against a configurable backend and data scale. For each step it records
+wall time, query count, result bytes and the step's own peak RSS (Linux
+only), and can compare the run against a stored baseline JSON.
+
+Usage:
+    python benchmark.py --backend duckdb --scale 1M --save-baseline bench_baseline.json
+    python benchmark.py --backend duckdb --scale 1M --baseline bench_baseline.json
+    python benchmark.py --backend snowflake --only get_revenue_by_year
+    python benchmark.py --backend duckdb --latency 0.5 --sessions 20   # concurrent-session load test
+"""
+import argparse
+import datetime
+import fnmatch
+import inspect
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+from pathlib import Path
+
+APP_PATH = Path(__file__).with_name("streamlit_app.py")
+
+# Getters that need arguments, benchmarked with these representative values
+PARAMETERIZED = {
+    "get_revenue_by_year": [("ALL",), ("Commerce",), ("Live",)],
+    "get_opco_filtered_stats": [("FBG (Sportsbook)",)],
+}
+
+
+class CountingConnection:
+    """Wraps a backend connection and counts the queries and result bytes it serves"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.queries = 0
+        self.bytes = 0
+        self._lock = threading.Lock()
+
+    def query(self, sql, **kwargs):
+        df = self.conn.query(sql, **kwargs)
+        with self._lock:
+            self.queries += 1
+            self.bytes += int(df.memory_usage(deep=True).sum())
+        return df
+
+    def reset(self):
+        with self._lock:
+            self.queries = 0
+            self.bytes = 0
+
+
+def reset_peak_rss():
+    """Restart the kernel's peak-RSS counter (VmHWM) for this process; False where that is not possible.
+
+    ru_maxrss only ever grows over the process lifetime, so it cannot tell
+    one step's peak from an earlier step's.
+    """
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+    except OSError:
+        return False
+    return True
+
+
+def _status_mb(field):
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith(f"{field}:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def rss_mb():
+    """Current RSS in MiB, or None off Linux"""
+    return _status_mb("VmRSS")
+
+
+def peak_rss_mb():
+    """Peak RSS in MiB since the last ``reset_peak_rss``, or None off Linux"""
+    return _status_mb("VmHWM")
+
+
+def measure(fn, counter, repeat=1):
+    """Run ``fn`` ``repeat`` times; median wall time plus the queries/bytes of the last run"""
+    walls, peaks, growths = [], [], []
+    for _ in range(repeat):
+        counter.reset()
+        before = rss_mb() if reset_peak_rss() else None
+        start = time.perf_counter()
+        fn()
+        walls.append(time.perf_counter() - start)
+        peak = peak_rss_mb() if before is not None else None
+        peaks.append(peak)
+        growths.append(None if peak is None else round(peak - before, 1))
+    return {
+        "wall_s": round(statistics.median(walls), 4),
+        "queries": counter.queries,
+        "bytes": counter.bytes,
+        # This step's own peak, and how far it rose above the RSS the step started at
+        "peak_rss_mb": None if None in peaks else max(peaks),
+        "rss_growth_mb": None if None in growths else max(growths),
+    }
+
+
+def getter_cases(app):
+    """(name, callable) for every get_* data function in the app module"""
+    cases = []
+    for name, fn in sorted(vars(app).items()):
+        if not name.startswith("get_") or name == "get_connection" or not callable(fn):
+            continue
+        if getattr(fn, "__module__", None) != app.__name__:
+            continue
+        if name in PARAMETERIZED:
+            for args in PARAMETERIZED[name]:
+                label = f"{name}({', '.join(repr(a) for a in args)})"
+                cases.append((label, lambda fn=fn, args=args: fn(*args)))
+            continue
+        params = inspect.signature(fn).parameters.values()
+        if all(p.default is not p.empty for p in params):
+            cases.append((f"{name}()", fn))
+    return cases
+
+
+def render_tab(tab):
+    """Render the dashboard headlessly with AppTest, with ``tab`` open"""
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(str(APP_PATH), default_timeout=600)
+    at.session_state["active_tab"] = tab
+    at.run()
+    if at.exception:
+        raise RuntimeError(f"{tab} failed: {at.exception[0].message}")
+
+
+def page_cases(app):
+    """(name, callable) rendering each tab headlessly with AppTest"""
+    return [(f"page: {tab}", lambda tab=tab: render_tab(tab)) for tab in app.TABS]
+
+
+def load_test(app, counter, clear_caches, sessions, pages=True, bypass_getter_cache=False):
+    """Open ``sessions`` dashboards at the same moment on cold caches.
+
+    Reports how many warehouse queries actually ran and how many identical
+    in-flight queries were coalesced by the single-flight layer. The getter
+    caches coalesce concurrent loads themselves; ``bypass_getter_cache``
+    calls the uncached getter bodies so only single-flight stands between
+    the sessions and the warehouse.
+    """
+    from query_batch import QUERY_FLIGHT
+
+    if bypass_getter_cache:
+        getters = [inspect.unwrap(getter) for getter in app.SUMMARY_GETTERS]
+        def open_session():
+            for getter in getters:
+                getter()
+    elif pages:
+        open_session = partial(render_tab, next(iter(app.TABS)))
+    else:
+        cases = getter_cases(app)
+        def open_session():
+            for _, fn in cases:
+                fn()
+
+    clear_caches()
+    counter.reset()
+    QUERY_FLIGHT.reset()
+    barrier = threading.Barrier(sessions)
+    latencies, errors = [], []
+
+    def session():
+        barrier.wait()
+        start = time.perf_counter()
+        try:
+            open_session()
+        except Exception as exc:
+            errors.append(exc)
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=session) for _ in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    flight = QUERY_FLIGHT.stats()
+    return {
+        "sessions": sessions,
+        "wall_s": round(time.perf_counter() - start, 4),
+        "p50_s": round(statistics.median(latencies), 4),
+        "max_s": round(max(latencies), 4),
+        "queries": counter.queries,
+        "flight_executed": flight["executed"],
+        "flight_coalesced": flight["coalesced"],
+    }
+
+
+def run_benchmarks(app, counter, clear_caches, only=None, repeat=1, pages=True):
+    results = {}
+    cases = getter_cases(app) + (page_cases(app) if pages else [])
+    for name, fn in cases:
+        if only and not any(fnmatch.fnmatch(name, f"*{pattern}*") for pattern in only):
+            continue
+
+        def cold(fn=fn):
+            clear_caches()
+            fn()
+
+        results[name] = {
+            "cold": measure(cold, counter, repeat),
+            "warm": measure(fn, counter, repeat),
+        }
+        print(format_row(name, results[name]), flush=True)
+    return results
+
+
+def format_row(name, result):
+    cold, warm = result["cold"], result["warm"]
+    rss = "n/a" if cold["peak_rss_mb"] is None else f"{cold['peak_rss_mb']}MiB (+{cold['rss_growth_mb']})"
+    return (
+        f"{name:<48} cold {cold['wall_s']:>8.3f}s {cold['queries']:>3}q {cold['bytes'] / 1024:>9.1f}KiB"
+        f"   warm {warm['wall_s']:>8.3f}s {warm['queries']:>3}q   cold peak rss {rss}"
+    )
+
+
+def compare(results, baseline, tolerance):
+    """List regressions against ``baseline``: slower by more than ``tolerance`` or more queries"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for mode in ("cold", "warm"):
+            now, then = result[mode], base[mode]
+            # Ignore timer noise below 10ms
+            if now["wall_s"] > then["wall_s"] * (1 + tolerance) and now["wall_s"] - then["wall_s"] > 0.01:
+                regressions.append(f"{name} [{mode}] wall {then['wall_s']:.3f}s -> {now['wall_s']:.3f}s")
+            if now["queries"] > then["queries"]:
+                regressions.append(f"{name} [{mode}] queries {then['queries']} -> {now['queries']}")
+    return regressions
+
+
+def configure_backend(args):
+    """Export the backend settings before the app modules read them; returns the DuckDB file used (None for Snowflake)"""
+    os.environ["FANGRAPH_BACKEND"] = args.backend
+    os.environ["FANGRAPH_QUERY_LATENCY"] = str(args.latency)
+    # A private disk result cache and summary directory, cleared with the
+    # in-memory caches for cold runs. The summaries also hold the persisted
+    # monthly commerce histories, which would otherwise turn a cold commerce
+    # load into a query for the open months only.
+    os.environ["FANGRAPH_RESULT_CACHE_DIR"] = tempfile.mkdtemp(prefix="fangraph_bench_cache_")
+    os.environ["FANGRAPH_SUMMARY_DIR"] = tempfile.mkdtemp(prefix="fangraph_bench_summaries_")
+    if args.backend == "duckdb":
+        db = args.db or f"fangraph_{args.scale.lower()}.duckdb"
+        if not os.path.exists(db):
+            import generate_synthetic_data
+            print(f"Generating {db} ({args.scale})")
+            generate_synthetic_data.generate(db, generate_synthetic_data.parse_scale(args.scale))
+        os.environ["FANGRAPH_DUCKDB_PATH"] = db
+        return db
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--backend", default=os.environ.get("FANGRAPH_BACKEND", "duckdb"), choices=["duckdb", "snowflake"])
+    parser.add_argument("--scale", default="1M", help="Synthetic data scale for the duckdb backend (1M, 10M, 100M)")
+    parser.add_argument("--db", help="DuckDB file (default fangraph_<scale>.duckdb, generated if missing)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Artificial per-query latency in seconds")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (median wall time is kept)")
+    parser.add_argument("--only", nargs="*", help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--no-pages", action="store_true", help="Skip the AppTest page renders")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", help="Write this run's results to a baseline JSON")
+    parser.add_argument("--sessions", type=int, help="Load test: open this many cold sessions concurrently instead")
+    parser.add_argument("--bypass-getter-cache", action="store_true", help="Load test the base queries with only single-flight coalescing them")
+    args = parser.parse_args()
+
+    database = configure_backend(args)
+
+    import backends
+
+    counter = None
+    connect = backends.connect
+
+    def counting_connect(*a, **kw):
+        nonlocal counter
+        if counter is None:
+            counter = CountingConnection(connect(*a, **kw))
+        return counter
+
+    backends.connect = counting_connect
+    import streamlit_app as app
+    counting_connect()
+
+    import result_cache
+    import summaries
+    import swr_cache
+
+    def clear_caches():
+        swr_cache.clear_all()
+        summaries.clear()
+        if result_cache.default_cache() is not None:
+            result_cache.default_cache().clear()
+
+    print(f"Backend {args.backend}" + (f" database {database}" if database else "") + f" latency {args.latency}s")
+    if args.sessions:
+        result = load_test(app, counter, clear_caches, args.sessions, pages=not args.no_pages, bypass_getter_cache=args.bypass_getter_cache)
+        print(
+            f"{result['sessions']} concurrent sessions: wall {result['wall_s']:.3f}s, "
+            f"p50 {result['p50_s']:.3f}s, max {result['max_s']:.3f}s, {result['queries']} warehouse queries, "
+            f"{result['flight_coalesced']} coalesced by single-flight"
+        )
+        return
+    results = run_benchmarks(app, counter, clear_caches, args.only, args.repeat, pages=not args.no_pages)
+
+    report = {
+        "meta": {
+            "backend": args.backend,
+            "database": database,
+            # Only meaningful for a generated database
+            "scale": args.scale if database and not args.db else None,
+            "latency": args.latency,
+            "python": platform.python_version(),
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    if args.save_baseline:
+        Path(args.save_baseline).write_text(json.dumps(report, indent=2))
+        print(f"Saved baseline to {args.save_baseline}")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) vs {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
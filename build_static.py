@@ -0,0 +1,133 @@
+"""Build the static dashboard (index.html) from live data.
+
+Runs the dashboard's own ``get_*`` data functions once and embeds their
+results as compact JSON in the ``<script id="fangraph-data">`` block of the
+template. The page draws every chart, table and KPI card from that block,
+so the generated file is self-contained: it opens straight from disk or any
+static host and costs nothing in the warehouse per view.
+
+Usage:
+    python build_static.py                           # refresh index.html in place
+    python build_static.py --out site/index.html     # write elsewhere
+    FANGRAPH_BACKEND=duckdb python build_static.py --out /tmp/index.html
+"""
+import argparse
+import datetime
+import json
+import re
+from pathlib import Path
+
+import pandas as pd
+
+TEMPLATE = Path(__file__).with_name("index.html")
+
+DATA_BLOCK = re.compile(r'(<script id="fangraph-data" type="application/json">)(.*?)(</script>)', re.S)
+
+
+def snapshot():
+    """Every dataset and KPI the static page shows, from the dashboard's getters"""
+    import streamlit_app as app
+
+    fmt = app.format_number
+    opco_df = app.get_opco_breakdown()
+    total_fans = int(opco_df.loc[opco_df['OPCO'] == 'Total Fans', 'FAN_COUNT'].iloc[0])
+    opcos = opco_df[opco_df['OPCO'] != 'Total Fans']
+    commerce_fans = int(opcos.loc[opcos['OPCO'] == 'Commerce', 'FAN_COUNT'].iloc[0])
+    leagues = app.get_league_preferences()
+    nfl_fans = int(leagues.loc[leagues['LEAGUE'] == 'NFL', 'FAN_COUNT'].iloc[0])
+    nfl = app.get_nfl_teams()
+    age = app.get_age_demographics()
+    geo = app.get_geo_data()
+
+    commerce = app.get_commerce_trends().sort_values('MONTH')
+    for col in ('REVENUE', 'ORDERS', 'CUSTOMERS'):
+        commerce[col] = commerce[col].astype(float)
+    # KPIs cover the 24 complete months, as the Commerce tab's windows do - not the open current month
+    windows = app.commerce_windows(pd.Timestamp.now())
+    trailing_start, this_month = windows["Trailing 12 Months"]
+    previous_start = windows["Previous 12 Months"][0]
+    complete = commerce[(commerce['MONTH'] >= previous_start) & (commerce['MONTH'] < this_month)]
+    total_revenue = complete['REVENUE'].sum()
+    total_orders = complete['ORDERS'].sum()
+    peak = complete.loc[complete['REVENUE'].idxmax()]
+    trailing = complete.loc[complete['MONTH'] >= trailing_start, 'REVENUE'].sum()
+    previous = complete.loc[complete['MONTH'] < trailing_start, 'REVENUE'].sum()
+
+    kpis = {
+        "generated": datetime.datetime.now().strftime("%Y-%m-%d %H:%M"),
+        "total_fans": fmt(total_fans),
+        "total_revenue": "$" + fmt(total_revenue),
+        "opco_count": str(len(opcos)),
+        "commerce_fans": fmt(commerce_fans),
+        "commerce_share": f"{commerce_fans / total_fans * 100:.1f}% of total fan base",
+        "nfl_fans": fmt(nfl_fans),
+        "peak_revenue": "$" + fmt(peak['REVENUE']),
+        "peak_month": peak['MONTH'].strftime('%B %Y'),
+        "total_orders": fmt(total_orders),
+        "avg_order_value": f"${total_revenue / total_orders:.2f}" if total_orders else "N/A",
+        "yoy_growth": f"{(trailing / previous - 1) * 100:+.1f}%" if previous else "N/A",
+        "largest_age_group": age['AGE_RANGE'].iloc[0],
+        "largest_age_group_fans": f"{fmt(age['FAN_COUNT'].iloc[0])} fans",
+        "top_state": geo['STATE'].iloc[0],
+        "top_state_fans": f"{fmt(geo['FAN_COUNT'].iloc[0])} fans",
+        "fans_with_age": fmt(age['FAN_COUNT'].sum()),
+        "top3_state_share": f"{geo['FAN_COUNT'].head(3).sum() / total_fans * 100:.0f}%",
+    }
+    for i, row in enumerate(opcos.head(4).itertuples(), 1):
+        kpis[f"opco_{i}"], kpis[f"opco_{i}_label"] = fmt(row.FAN_COUNT), f"{row.OPCO} Fans"
+    for i, row in enumerate(nfl.head(4).itertuples(), 1):
+        kpis[f"nfl_team_{i}"], kpis[f"nfl_team_{i}_label"] = fmt(row.FAN_COUNT), row.NFL_TEAM
+    for i, row in enumerate(leagues.head(4).itertuples(), 1):
+        kpis[f"league_{i}"], kpis[f"league_{i}_label"] = fmt(row.FAN_COUNT), f"{row.LEAGUE} Fans"
+
+    return {
+        "opcoData": {"categories": opcos['OPCO'].tolist(), "values": opcos['FAN_COUNT'].astype(int).tolist()},
+        "commerceData": {
+            "months": commerce['MONTH'].dt.strftime('%b %y').tolist(),
+            "revenue": (commerce['REVENUE'] / 1_000_000).round(1).tolist(),
+            "orders": (commerce['ORDERS'] / 1_000_000).round(2).tolist(),
+            "customers": (commerce['CUSTOMERS'] / 1_000_000).round(2).tolist(),
+        },
+        "nflData": {"teams": nfl['NFL_TEAM'].tolist(), "fans": nfl['FAN_COUNT'].astype(int).tolist()},
+        "ageData": {"ranges": age['AGE_RANGE'].tolist(), "counts": age['FAN_COUNT'].astype(int).tolist()},
+        "geoData": {"states": geo['STATE'].tolist(), "fans": geo['FAN_COUNT'].astype(int).tolist()},
+        "leagueData": {"leagues": leagues['LEAGUE'].tolist(), "fans": leagues['FAN_COUNT'].astype(int).tolist()},
+        "totalFans": total_fans,
+        "totalRevenue": round(float(total_revenue), 2),
+        "totalNFLFans": nfl_fans,
+        "kpis": kpis,
+    }
+
+
+def render(template, data):
+    """``template`` with its fangraph-data block replaced by ``data``"""
+    # "</" would end the <script> element early
+    payload = json.dumps(data, separators=(",", ":"), ensure_ascii=False).replace("</", "<\\/")
+    html, count = DATA_BLOCK.subn(lambda m: m.group(1) + payload + m.group(3), template, count=1)
+    if not count:
+        raise ValueError('template has no <script id="fangraph-data" type="application/json"> block')
+    return html
+
+
+def build_static(out=None, template=None):
+    """Write the static dashboard with a fresh data snapshot; returns (path, bytes of embedded JSON)"""
+    data = snapshot()
+    html = render(Path(template or TEMPLATE).read_text(encoding="utf-8"), data)
+    path = Path(out or TEMPLATE)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html, encoding="utf-8")
+    return path, len(json.dumps(data, separators=(",", ":")))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--out", help="Output HTML file (default: overwrite index.html)")
+    parser.add_argument("--template", help="Template HTML with a fangraph-data block (default index.html)")
+    args = parser.parse_args()
+
+    path, size = build_static(args.out, args.template)
+    print(f"Wrote {path} ({size / 1024:.1f} KiB of data)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""Materialize the dashboard's aggregates into local Parquet summaries.
+
+Runs the warehouse queries behind the fan cube (OpCo, league, age and state
+counts), the team cube (league x team x OpCo counts), the monthly commerce
+trend and the per-year revenue frame once, and writes each result to
+FANGRAPH_SUMMARY_DIR stamped with its build time. The dashboard getters
+read these summaries and fall back to live queries when one is missing or
+stale.
+
+Usage:
+    python build_summaries.py                    # build once
+    python build_summaries.py --interval 3600    # rebuild every hour
+    FANGRAPH_BACKEND=duckdb python build_summaries.py --out summaries/
+"""
+import argparse
+import time
+from pathlib import Path
+
+
+def build_summaries(out=None):
+    """Run every summary query live and write its result; returns {name: (rows, seconds)}"""
+    import summaries
+    import streamlit_app as app
+    from swr_cache import clear_all
+
+    if out:
+        summaries.SUMMARY_DIR = Path(out)
+    clear_all()
+    built = {}
+    with summaries.build_mode():
+        for getter in app.SUMMARY_GETTERS:
+            start = time.perf_counter()
+            df = getter()
+            built[getter.__name__] = (len(df), time.perf_counter() - start)
+    clear_all()
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--out", help="Summary directory (default FANGRAPH_SUMMARY_DIR or ./summaries)")
+    parser.add_argument("--interval", type=float, help="Keep running and rebuild every INTERVAL seconds")
+    args = parser.parse_args()
+
+    while True:
+        for name, (rows, seconds) in build_summaries(args.out).items():
+            print(f"{name:<24} {rows:>8} rows  {seconds:6.2f}s", flush=True)
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
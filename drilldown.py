@@ -0,0 +1,90 @@
+"""Fan-level drill-down behind an aggregate bar, paged server-side.
+
+A bar on the team, state, age or OpCo charts stands for a set of FANGRAPH
+rows, which may number in the millions. ``fetch_page`` reads one page of
+them with keyset pagination. The query is ``WHERE <bar filters> AND
+FANGRAPH_ID > <last id of the previous page> ORDER BY FANGRAPH_ID LIMIT n``,
+so every page costs the same no matter how deep the reader goes. Only one
+page of rows is ever held in memory. OFFSET paging, by contrast, would scan
+and discard every row before the page.
+
+FANGRAPH_DRILLDOWN_PAGE_SIZE sets the rows per page (default 100).
+"""
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from query_builder import OPCO_COLUMNS, contains, eq, gt, select
+from segments import ALL_FANS, as_segment
+
+PAGE_SIZE = int(os.environ.get("FANGRAPH_DRILLDOWN_PAGE_SIZE", "100"))
+
+TABLE = "FANGRAPH.ADMIN.FANGRAPH"
+
+# Output column -> expression for every fan row shown
+COLUMNS = {
+    "FANGRAPH_ID": "FANGRAPH_ID",
+    "AGE_RANGE": "FANGRAPH_AGE_RANGE",
+    "STATE": "FANGRAPH_STATE",
+    **{col: f"COALESCE({col}_FAN_INDICATOR, FALSE)" for col in OPCO_COLUMNS.values()},
+}
+
+
+class Page(NamedTuple):
+    rows: object
+    has_next: bool
+    next_after: object = None
+
+
+def team_filters(league, team):
+    """Fans who follow ``team`` (the raw FANGRAPH_PREFERENCE_<league>_TEAMS value)"""
+    return [contains(f"FANGRAPH_PREFERENCE_{league}_TEAMS", team)]
+
+
+def nfl_team_filters(team):
+    return team_filters("NFL", team)
+
+
+def state_filters(state):
+    return [eq("FANGRAPH_STATE", state)]
+
+
+def age_filters(age_range):
+    return [eq("FANGRAPH_AGE_RANGE", age_range)]
+
+
+def bar_filters(segment=ALL_FANS, **dimensions):
+    """Filters for one bar: an OpCo segment (or label) plus any of ``nfl_team``, ``state`` and ``age_range``"""
+    builders = {"nfl_team": nfl_team_filters, "state": state_filters, "age_range": age_filters}
+    filters = as_segment(segment).filters()
+    for name, value in dimensions.items():
+        filters.extend(builders[name](value))
+    return filters
+
+
+def page_query(filters, after=None, page_size=PAGE_SIZE):
+    """One page of fans matching ``filters`` with FANGRAPH_ID above ``after``, in ID order.
+
+    One row more than ``page_size`` is requested so the caller knows
+    whether another page follows.
+    """
+    keyset = [] if after is None else [gt("FANGRAPH_ID", after)]
+    return select(TABLE, measures=COLUMNS, filters=[*filters, *keyset], order_by=["FANGRAPH_ID"], limit=page_size + 1)
+
+
+def fetch_page(run_query, filters, after=None, page_size=PAGE_SIZE):
+    """Run ``page_query`` through ``run_query(sql, params)`` and return the ``Page``"""
+    df = run_query(*page_query(filters, after, page_size))
+    has_next = len(df) > page_size
+    df = df.head(page_size)
+    if not has_next:
+        return Page(df, False)
+    # The raw ID is the cursor: NUMBER(38) or VARCHAR IDs must not go through int()
+    last = df['FANGRAPH_ID'].iloc[-1]
+    return Page(df, True, last.item() if isinstance(last, np.generic) else last)
+
+
+def export_query(filters):
+    """Every fan matching ``filters`` - unordered, so the warehouse can stream rows as it finds them"""
+    return select(TABLE, measures=COLUMNS, filters=filters)
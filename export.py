@@ -0,0 +1,98 @@
+"""Streaming CSV/Parquet export of dashboard datasets and drill-downs.
+
+``write_batches`` writes Arrow batches to disk one at a time as they arrive,
+so exporting millions of drill-down rows never builds a DataFrame (or even
+a whole Arrow table) in the Streamlit process. The file is written under a
+temporary name and only renamed into place once complete; a failed or
+cancelled export - including Streamlit stopping the script because the
+user clicked Cancel - leaves nothing behind.
+
+Finished exports go to FANGRAPH_EXPORT_DIR (default: a ``fangraph_exports``
+folder in the system temp dir) and are pruned after EXPORT_MAX_AGE_HOURS.
+"""
+import os
+import re
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+EXPORT_DIR = Path(os.environ.get("FANGRAPH_EXPORT_DIR", os.path.join(tempfile.gettempdir(), "fangraph_exports")))
+EXPORT_MAX_AGE_HOURS = 24
+BATCH_ROWS = 50_000
+
+# Format label -> (file extension, MIME type)
+FORMATS = {
+    "CSV": ("csv", "text/csv"),
+    "Parquet": ("parquet", "application/vnd.apache.parquet"),
+}
+
+
+class ExportCancelled(Exception):
+    """Raised when ``should_stop`` asks a running export to stop"""
+
+
+def frame_batches(df, batch_rows=BATCH_ROWS):
+    """Arrow batches of an in-memory DataFrame, for exporting a tab's dataset"""
+    return pa.Table.from_pandas(df, preserve_index=False).to_batches(batch_rows)
+
+
+def export_path(name, fmt, directory=None):
+    """A fresh file path for exporting ``name`` in format ``fmt``"""
+    slug = re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-") or "export"
+    extension = FORMATS[fmt][0]
+    return Path(directory or EXPORT_DIR) / f"fangraph-{slug}-{time.strftime('%Y%m%d-%H%M%S')}.{extension}"
+
+
+def prune(directory=None, max_age_hours=EXPORT_MAX_AGE_HOURS):
+    """Delete exports older than ``max_age_hours``"""
+    cutoff = time.time() - max_age_hours * 3600
+    for path in Path(directory or EXPORT_DIR).glob("fangraph-*"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+        except OSError:
+            pass
+
+
+def _open_writer(path, schema, fmt):
+    if fmt == "Parquet":
+        return pq.ParquetWriter(path, schema, compression="zstd")
+    return pacsv.CSVWriter(path, schema)
+
+
+def write_batches(batches, path, fmt, progress=None, should_stop=None):
+    """Stream Arrow batches (RecordBatches or Tables) into a CSV or Parquet file at ``path``.
+
+    ``progress(rows)`` is called after every batch; ``should_stop()`` is
+    checked before every batch and cancels the export with ExportCancelled.
+    Returns the number of rows written - 0 means there was nothing to
+    export and no file was created.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".part")
+    writer = None
+    rows = 0
+    try:
+        for batch in batches:
+            if should_stop is not None and should_stop():
+                raise ExportCancelled(f"Export to {path.name} cancelled after {rows:,} rows")
+            if writer is None:
+                writer = _open_writer(tmp, batch.schema, fmt)
+            writer.write(batch)
+            rows += batch.num_rows
+            if progress is not None:
+                progress(rows)
+        if writer is not None:
+            writer.close()
+            writer = None
+            os.replace(tmp, path)
+    finally:
+        if writer is not None:
+            writer.close()
+        tmp.unlink(missing_ok=True)
+    return rows
@@ -0,0 +1,96 @@
+"""Reuse built Plotly figures across reruns when their input data is unchanged.
+
+Every Streamlit rerun used to rebuild every chart from scratch. A
+``px.bar`` with its layout takes around 100 ms of server CPU, even when the
+cached DataFrame behind it is identical to the last run's. Functions
+decorated with ``cached_figure`` build a figure from their arguments. The
+figure is kept in a process-wide LRU keyed by the builder's identity
+(module, name and code) plus a content hash of every argument. DataFrames
+are hashed by value, so equal data from another session or a later rerun
+reuses the same figure.
+
+Cached figures are shared: callers must treat them as read-only and put
+every trace, layout or axis change inside the builder.
+
+FANGRAPH_FIGURE_CACHE_SIZE bounds the number of figures kept (default 256;
+0 disables the cache).
+"""
+import functools
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+FIGURE_CACHE_SIZE = int(os.environ.get("FANGRAPH_FIGURE_CACHE_SIZE", "256"))
+
+_figures = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def frame_fingerprint(df):
+    """Content hash of a DataFrame or Series: columns, dtypes, index and values"""
+    if isinstance(df, pd.Series):
+        df = df.to_frame()
+    digest = hashlib.sha1(repr((list(df.columns), [str(dtype) for dtype in df.dtypes])).encode())
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Unhashable cells (e.g. lists of OpCo labels) - hash their JSON instead
+        digest.update(df.to_json(orient="split", date_format="iso").encode())
+    return digest.hexdigest()
+
+
+def fingerprint(value):
+    """Stable content hash of builder arguments: frames by value, containers recursively"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return frame_fingerprint(value)
+    if isinstance(value, dict):
+        return repr(sorted((repr(key), fingerprint(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple)):
+        return repr([fingerprint(item) for item in value])
+    return repr(value)
+
+
+def _builder_identity(build):
+    code = inspect.unwrap(build).__code__
+    return (build.__module__, build.__qualname__, code.co_code, repr(code.co_consts))
+
+
+def cached_figure(build):
+    """Decorator returning the cached figure for equal arguments, building it on a miss"""
+    identity = _builder_identity(build)
+
+    @functools.wraps(build)
+    def wrapper(*args, **kwargs):
+        if FIGURE_CACHE_SIZE <= 0:
+            return build(*args, **kwargs)
+        key = (identity, fingerprint(args), fingerprint(kwargs))
+        with _lock:
+            fig = _figures.get(key)
+            if fig is not None:
+                _figures.move_to_end(key)
+                _stats["hits"] += 1
+                return fig
+            _stats["misses"] += 1
+        fig = build(*args, **kwargs)
+        with _lock:
+            _figures[key] = fig
+            while len(_figures) > FIGURE_CACHE_SIZE:
+                _figures.popitem(last=False)
+        return fig
+
+    return wrapper
+
+
+def stats():
+    with _lock:
+        return {**_stats, "figures": len(_figures)}
+
+
+def clear():
+    with _lock:
+        _figures.clear()
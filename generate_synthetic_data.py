@@ -0,0 +1,241 @@
+"""Generate a synthetic FanGraph database for the DuckDB backend.
+
+Builds scaled, reproducible stand-ins for the tables the dashboard reads:
+
+- FANGRAPH.ADMIN.FANGRAPH
+- FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE
+- FANGRAPH.FBG.DIM_FBG_PURCHASE
+- FANGRAPH.EVENTS.DIM_EVENTS_PURCHASE
+- FANGRAPH.TOPPS.DIM_TOPPS_PURCHASE
+
+Rows are generated inside DuckDB from ``range()`` with hash-based
+pseudo-random values, so 100M rows never pass through Python and the same
+``--seed`` and ``--end-date`` always produce the same data.
+
+Usage:
+    python generate_synthetic_data.py --scale 1M --out fangraph.duckdb
+    FANGRAPH_BACKEND=duckdb FANGRAPH_DUCKDB_PATH=fangraph.duckdb streamlit run streamlit_app.py
+"""
+import argparse
+import datetime
+import os
+import time
+
+SCALES = {"1M": 1_000_000, "10M": 10_000_000, "100M": 100_000_000}
+
+# Share of FANGRAPH fans flagged for each OpCo / league (roughly production proportions)
+OPCO_RATES = {
+    "COMMERCE": 0.918,
+    "TOPPS_DIGITAL": 0.031,
+    "TOPPS_COM": 0.018,
+    "FBG": 0.052,
+    "FANAPP": 0.041,
+    "LIVE": 0.022,
+    "COLLECT": 0.009,
+    "EVENTS": 0.014,
+}
+
+LEAGUE_RATES = {"NFL": 0.205, "MLB": 0.134, "NBA": 0.112, "NCAA": 0.091, "NHL": 0.058}
+
+AGE_RANGES = ["18-30", "31-40", "41-50", "51-60", "61-70", "70+"]
+
+STATES = [
+    "CA", "TX", "FL", "NY", "PA", "IL", "OH", "GA", "NC", "MI", "NJ", "VA", "WA", "AZ", "MA",
+    "TN", "IN", "MO", "MD", "WI", "CO", "MN", "SC", "AL", "LA", "KY", "OR", "OK", "CT", "UT",
+]
+
+TEAMS = {
+    "NFL": [
+        "DALLAS COWBOYS", "KANSAS CITY CHIEFS", "PHILADELPHIA EAGLES", "GREEN BAY PACKERS",
+        "SAN FRANCISCO 49ERS", "PITTSBURGH STEELERS", "NEW ENGLAND PATRIOTS", "BUFFALO BILLS",
+        "CHICAGO BEARS", "LAS VEGAS RAIDERS", "DETROIT LIONS", "NEW YORK GIANTS",
+        "BALTIMORE RAVENS", "DENVER BRONCOS", "SEATTLE SEAHAWKS", "MIAMI DOLPHINS",
+        "CINCINNATI BENGALS", "MINNESOTA VIKINGS", "NEW YORK JETS", "CLEVELAND BROWNS",
+        "LOS ANGELES RAMS", "TAMPA BAY BUCCANEERS", "NEW ORLEANS SAINTS", "ATLANTA FALCONS",
+        "WASHINGTON COMMANDERS", "HOUSTON TEXANS", "INDIANAPOLIS COLTS", "LOS ANGELES CHARGERS",
+        "ARIZONA CARDINALS", "CAROLINA PANTHERS", "JACKSONVILLE JAGUARS", "TENNESSEE TITANS",
+    ],
+    "MLB": [
+        "NEW YORK YANKEES", "LOS ANGELES DODGERS", "BOSTON RED SOX", "CHICAGO CUBS",
+        "ATLANTA BRAVES", "PHILADELPHIA PHILLIES", "ST. LOUIS CARDINALS", "NEW YORK METS",
+        "HOUSTON ASTROS", "SAN FRANCISCO GIANTS", "TEXAS RANGERS", "SAN DIEGO PADRES",
+        "SEATTLE MARINERS", "DETROIT TIGERS", "CLEVELAND GUARDIANS", "BALTIMORE ORIOLES",
+    ],
+    "NBA": [
+        "LOS ANGELES LAKERS", "GOLDEN STATE WARRIORS", "BOSTON CELTICS", "CHICAGO BULLS",
+        "NEW YORK KNICKS", "MIAMI HEAT", "PHILADELPHIA 76ERS", "DALLAS MAVERICKS",
+        "MILWAUKEE BUCKS", "DENVER NUGGETS", "PHOENIX SUNS", "CLEVELAND CAVALIERS",
+    ],
+    "NHL": [
+        "TORONTO MAPLE LEAFS", "BOSTON BRUINS", "CHICAGO BLACKHAWKS", "PITTSBURGH PENGUINS",
+        "NEW YORK RANGERS", "DETROIT RED WINGS", "PHILADELPHIA FLYERS", "VEGAS GOLDEN KNIGHTS",
+    ],
+    "NCAA": [
+        "ALABAMA CRIMSON TIDE", "OHIO STATE BUCKEYES", "MICHIGAN WOLVERINES", "GEORGIA BULLDOGS",
+        "TEXAS LONGHORNS", "NOTRE DAME FIGHTING IRISH", "LSU TIGERS", "PENN STATE NITTANY LIONS",
+    ],
+}
+
+# Purchase table rows per FANGRAPH row
+PURCHASE_RATIOS = {"COMMERCE": 0.6, "FBG": 0.15, "EVENTS": 0.03, "TOPPS": 0.04}
+
+
+def parse_scale(value):
+    """Parse a row count such as 1M, 250k or 5000000"""
+    value = value.strip().upper()
+    if value in SCALES:
+        return SCALES[value]
+    multiplier = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}.get(value[-1])
+    return int(float(value[:-1]) * multiplier) if multiplier else int(value)
+
+
+def sql_list(values):
+    return "[" + ", ".join("'" + v.replace("'", "''") + "'" for v in values) + "]"
+
+
+def rnd(salt):
+    """SQL expression for a reproducible uniform [0, 1) value per row and salt"""
+    return f"(hash(i, '{salt}', getvariable('seed')) % 1000000) / 1000000.0"
+
+
+def pick_index(values, salt, skew=1.0):
+    """SQL expression for a 0-based index into ``values``; skew > 1 favours the first entries"""
+    return f"floor(pow({rnd(salt)}, {skew}) * {len(values)})::INT"
+
+
+def pick(values, salt, skew=1.0):
+    """SQL expression choosing one of ``values``; skew > 1 favours the first entries"""
+    return f"{sql_list(values)}[1 + {pick_index(values, salt, skew)}]"
+
+
+def amount(flag_salt, rate, salt, scale):
+    """SQL expression for a lifetime amount that is only set for fans flagged by ``flag_salt``"""
+    return f"CASE WHEN {rnd(flag_salt)} < {rate} THEN round({rnd(salt)} * {scale}, 2) END::DECIMAL(18, 2)"
+
+
+def fangraph_sql(rows):
+    # Flags, team arrays and revenue reuse the same salt so they stay consistent per fan
+    columns = [f"{rnd(opco)} < {rate} AS {opco}_FAN_INDICATOR" for opco, rate in OPCO_RATES.items()]
+    columns += [f"{rnd(league)} < {rate} AS FANGRAPH_PREFERENCE_{league}" for league, rate in LEAGUE_RATES.items()]
+    for league, rate in LEAGUE_RATES.items():
+        teams, count = sql_list(TEAMS[league]), len(TEAMS[league])
+        first_index = pick_index(TEAMS[league], league + "_1", 1.6)
+        # Uniform over the other teams, so a fan never lists the same team twice
+        second_index = f"({first_index} + 1 + floor({rnd(league + '_2')} * {count - 1})::INT) % {count}"
+        first, second = f"{teams}[1 + {first_index}]", f"{teams}[1 + {second_index}]"
+        columns.append(
+            f"CASE WHEN {rnd(league)} < {rate} THEN "
+            f"CASE WHEN {rnd(league + '_N')} < 0.75 THEN [{first}] ELSE [{first}, {second}] END "
+            f"END AS FANGRAPH_PREFERENCE_{league}_TEAMS"
+        )
+    columns += [
+        f"CASE WHEN {rnd('AGE_NULL')} < 0.3 THEN NULL ELSE {pick(AGE_RANGES, 'AGE', 1.2)} END AS FANGRAPH_AGE_RANGE",
+        f"""CASE
+            WHEN {rnd('STATE_NULL')} < 0.08 THEN NULL
+            WHEN {rnd('STATE_NULL')} < 0.10 THEN 'UNKNOWN'
+            ELSE {pick(STATES, 'STATE', 1.8)}
+        END AS FANGRAPH_STATE""",
+        f"{amount('LIVE', OPCO_RATES['LIVE'], 'LIVE_REV', 900)} AS LIVE_TOTAL_REVENUE",
+        f"{amount('FANAPP', OPCO_RATES['FANAPP'], 'FANAPP_REV', 400)} AS FANAPP_COMMERCE_ORDER_AMOUNT_TOTAL",
+    ]
+    columns += [
+        f"{amount('TOPPS_DIGITAL', OPCO_RATES['TOPPS_DIGITAL'], 'TD_' + brand, 60)} AS TOPPS_DIGITAL_{brand}_SPEND_AMOUNT_LIFETIME"
+        for brand in ("BASEBALL", "DISNEY", "MARVEL", "STARWARS", "WWE")
+    ]
+    columns.append(f"{amount('COLLECT', OPCO_RATES['COLLECT'], 'COLLECT_REV', 2500)} AS COLLECT_REVENUE_LIFETIME")
+    column_sql = ",\n        ".join(columns)
+    return f"""
+    CREATE OR REPLACE TABLE admin.fangraph AS
+    SELECT
+        i AS FANGRAPH_ID,
+        {column_sql}
+    FROM range({rows}) t(i)
+    """
+
+
+def purchase_sql(table, rows, fans, ts_col, id_col, amount_cols, end_date, months=36, lines_per_order=1):
+    """SQL for one purchase table spread over the ``months`` before ``end_date``
+
+    Every line of an order shares ``i`` (the order id), so it also shares the
+    fan, timestamp and amounts.
+    """
+    amounts = ",\n        ".join(
+        f"round({rnd(table + '_' + col)} * {scale}, 2)::DECIMAL(18, 2) AS {col}" for col, scale in amount_cols
+    )
+    # Seasonal bump: a quarter of rows land in November/December of one of the last two years
+    return f"""
+    CREATE OR REPLACE TABLE {table} AS
+    SELECT
+        i AS {id_col},
+        (hash(i, 'FAN', getvariable('seed')) % {fans})::BIGINT AS FANGRAPH_ID,
+        CASE WHEN {rnd(table + '_SEASON')} < 0.25
+            THEN make_timestamp(
+                year(DATE '{end_date}') - 1 - floor({rnd(table + '_Y')} * 2)::INT,
+                11 + floor({rnd(table + '_M')} * 2)::INT, 1, 0, 0, 0
+            ) + to_seconds(floor({rnd(table + '_S')} * 29 * 86400)::BIGINT)
+            ELSE TIMESTAMP '{end_date}' - to_seconds(floor({rnd(table + '_TS')} * {months} * 30.4 * 86400)::BIGINT)
+        END AS {ts_col},
+        {amounts}
+    FROM (SELECT range // {lines_per_order} AS i FROM range({rows}))
+    """
+
+
+def generate(out, rows, seed=42, end_date=None, overwrite=False):
+    """Build the synthetic database at ``out`` with ``rows`` FANGRAPH fans"""
+    import duckdb
+
+    if os.path.exists(out):
+        if not overwrite:
+            raise FileExistsError(f"{out} exists - pass --overwrite to replace it")
+        os.remove(out)
+    end_date = end_date or datetime.date.today().isoformat()
+
+    con = duckdb.connect(out)
+    con.execute(f"SET VARIABLE seed = {int(seed)}")
+    for schema in ("admin", "commerce", "fbg", "events", "topps"):
+        con.execute(f"CREATE SCHEMA IF NOT EXISTS {schema}")
+
+    steps = [
+        ("ADMIN.FANGRAPH", fangraph_sql(rows)),
+        ("COMMERCE.DIM_COMMERCE_PURCHASE", purchase_sql(
+            "commerce.dim_commerce_purchase", int(rows * PURCHASE_RATIOS["COMMERCE"]), rows,
+            "ORDER_TS", "ORDER_REF_NUM", [("NET_DEMAND", 120), ("GROSS_DEMAND", 140)], end_date,
+            lines_per_order=2,
+        )),
+        ("FBG.DIM_FBG_PURCHASE", purchase_sql(
+            "fbg.dim_fbg_purchase", int(rows * PURCHASE_RATIOS["FBG"]), rows,
+            "WAGER_PLACED_TIME_UTC", "WAGER_ID", [("TOTAL_STAKE_BY_WAGER", 50)], end_date,
+        )),
+        ("EVENTS.DIM_EVENTS_PURCHASE", purchase_sql(
+            "events.dim_events_purchase", int(rows * PURCHASE_RATIOS["EVENTS"]), rows,
+            "ORDER_COMPLETED_TIME", "ORDER_ID", [("ORDER_TOTAL_PAID", 300)], end_date,
+        )),
+        ("TOPPS.DIM_TOPPS_PURCHASE", purchase_sql(
+            "topps.dim_topps_purchase", int(rows * PURCHASE_RATIOS["TOPPS"]), rows,
+            "ORDER_TS", "ORDER_ID", [("P_GMV_USD", 80)], end_date,
+        )),
+    ]
+    for name, sql in steps:
+        start = time.perf_counter()
+        con.execute(sql)
+        count = con.execute(f"SELECT COUNT(*) FROM {name.lower()}").fetchone()[0]
+        print(f"  {name:<32} {count:>13,} rows  {time.perf_counter() - start:6.1f}s")
+    con.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scale", default="1M", help="FANGRAPH rows: 1M, 10M, 100M or any count such as 250k")
+    parser.add_argument("--out", default="fangraph.duckdb", help="DuckDB file to write")
+    parser.add_argument("--seed", type=int, default=42, help="Seed for the hash-based random values")
+    parser.add_argument("--end-date", help="Latest purchase date (YYYY-MM-DD, default today)")
+    parser.add_argument("--overwrite", action="store_true", help="Replace --out if it exists")
+    args = parser.parse_args()
+
+    rows = parse_scale(args.scale)
+    print(f"Generating {rows:,} FANGRAPH rows into {args.out}")
+    generate(args.out, rows, seed=args.seed, end_date=args.end_date, overwrite=args.overwrite)
+
+
+if __name__ == "__main__":
+    main()
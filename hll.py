@@ -0,0 +1,87 @@
+"""HyperLogLog sketches for mergeable approximate distinct counts.
+
+``COUNT(DISTINCT ...)`` results cannot be added together, so monthly rows
+cannot answer "customers this quarter" or "trailing 12 vs previous 12
+months". A HyperLogLog sketch can: each group keeps ``m = 2**p`` registers
+holding the longest run of leading zeros seen among the hashed values that
+fall into that register, and the sketches of any set of groups merge by
+taking the per-register maximum.
+
+The registers are computed in the warehouse with plain SQL (``register_sql``)
+so only ``m`` small rows per group come back. The same SQL runs on Snowflake
+and DuckDB, though each backend has its own hash function, so sketches are
+only merged with others from the same backend. The standard error of an
+estimate is ``1.04 / sqrt(m)``, about 1.6% at the default precision of 12.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+PRECISION = 12
+
+# Hashes are reduced to HASH_BITS bits: the low PRECISION bits pick the
+# register, and the leading zeros of the rest are counted
+HASH_BITS = 52
+
+
+def error_bound(precision=PRECISION):
+    """Relative standard error of an estimate at this precision"""
+    return 1.04 / math.sqrt(1 << precision)
+
+
+def register_sql(column, precision=PRECISION):
+    """SQL for (register index, rank) of ``column`` - aggregate the rank with MAX per group"""
+    m = 1 << precision
+    width = HASH_BITS - precision
+    hashed = f"MOD(ABS(HASH({column})), {1 << HASH_BITS})"
+    rest = f"FLOOR({hashed} / {m})"
+    return (
+        f"MOD({hashed}, {m})",
+        f"CASE WHEN {rest} = 0 THEN {width + 1} ELSE {width} - FLOOR(LOG(2, {rest})) END",
+    )
+
+
+def estimate(index, rank, precision=PRECISION):
+    """Estimated distinct count from register ``index``/``rank`` arrays (duplicates take the max)"""
+    m = 1 << precision
+    registers = np.zeros(m)
+    np.maximum.at(registers, np.asarray(index, dtype=np.int64), np.asarray(rank, dtype=float))
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.sum(np.exp2(-registers))
+    empty = int(np.count_nonzero(registers == 0))
+    if raw <= 2.5 * m and empty:
+        # Small-range correction: linear counting over the empty registers
+        return m * math.log(m / empty)
+    return raw
+
+
+def merge_estimates(sketches, by, precision=PRECISION):
+    """Merge a long ``IDX``/``RANK`` sketch frame per ``by`` group and estimate each group.
+
+    Vectorized over every group at once: registers are merged with one
+    groupby max, and registers a group never saw count as empty (rank 0).
+    """
+    m = 1 << precision
+    keys = [by] if isinstance(by, str) else list(by)
+    registers = sketches.groupby(keys + ['IDX'])['RANK'].max().astype(float)
+    per_group = pd.DataFrame({
+        'inverse': np.exp2(-registers),
+        'filled': registers > 0,
+    }).groupby(level=keys).sum()
+    empty = m - per_group['filled']
+    # Absent registers contribute 2**-0 = 1 each to the harmonic sum
+    harmonic = per_group['inverse'] + (m - registers.groupby(level=keys).size())
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / harmonic
+    # Small-range correction: linear counting over the empty registers
+    linear = m * np.log(m / empty.where(empty > 0, m))
+    return raw.where((raw > 2.5 * m) | (empty == 0), linear).rename("ESTIMATE")
+
+
+def window_estimate(sketches, start, end, precision=PRECISION):
+    """Estimated distinct counts per ``METRIC`` for ``start <= MONTH < end``"""
+    window = sketches[(sketches['MONTH'] >= pd.Timestamp(start)) & (sketches['MONTH'] < pd.Timestamp(end))]
+    if window.empty:
+        return {}
+    return merge_estimates(window, 'METRIC', precision).to_dict()
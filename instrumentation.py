@@ -0,0 +1,159 @@
+"""Query instrumentation for the dashboard.
+
+Every rerun, cached getter call and warehouse query is recorded as a span
+(OpenTelemetry-style: trace id, span id, parent id, start, duration and
+attributes). Getter spans note whether ``st.cache_data`` served the call;
+query spans carry the SQL fingerprint, latency, row count, result bytes and
+the backend query id. Spans are kept in a bounded in-process log for the
+debug sidebar panel and, when FANGRAPH_QUERY_LOG is set, written as JSON
+lines to that file (``-`` for stderr).
+"""
+import contextvars
+import functools
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+
+QUERY_LOG = os.environ.get("FANGRAPH_QUERY_LOG")
+
+SPANS = deque(maxlen=5000)
+_lock = threading.Lock()
+_current = contextvars.ContextVar("fangraph_span", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LINE_COMMENT = re.compile(r"--[^\n]*")
+
+# Attributes a child span copies from its parent
+INHERITED = ("session", "tab")
+
+
+@dataclass
+class Span:
+    name: str
+    kind: str
+    trace_id: str
+    span_id: str
+    parent_id: str = None
+    start: float = 0.0
+    duration_s: float = 0.0
+    attributes: dict = field(default_factory=dict)
+    executed: bool = field(default=False, repr=False)
+
+
+def normalize_sql(sql):
+    """Collapse comments, whitespace and keyword case so equivalent SQL compares equal.
+
+    String literals are kept verbatim - only the SQL around them is normalized.
+    """
+    parts = []
+    last = 0
+    for match in _STRING_LITERAL.finditer(sql):
+        parts.append(" ".join(_LINE_COMMENT.sub(" ", sql[last:match.start()]).split()).upper())
+        parts.append(match.group())
+        last = match.end()
+    parts.append(" ".join(_LINE_COMMENT.sub(" ", sql[last:]).split()).upper())
+    return " ".join(part for part in parts if part)
+
+
+def fingerprint(sql):
+    """Short stable id for a query shape - literals replaced so only the structure counts"""
+    shape = _NUMBER_LITERAL.sub("?", _STRING_LITERAL.sub("?", normalize_sql(sql)))
+    return hashlib.sha1(shape.encode()).hexdigest()[:12]
+
+
+@contextmanager
+def span(name, kind, **attributes):
+    """Record a span around the block; nested spans join the enclosing trace"""
+    parent = _current.get()
+    s = Span(
+        name=name,
+        kind=kind,
+        trace_id=parent.trace_id if parent else uuid.uuid4().hex,
+        span_id=uuid.uuid4().hex[:16],
+        parent_id=parent.span_id if parent else None,
+        start=time.time(),
+        attributes={
+            **{key: parent.attributes[key] for key in INHERITED if parent and key in parent.attributes},
+            **attributes,
+        },
+    )
+    token = _current.set(s)
+    began = time.perf_counter()
+    try:
+        yield s
+    except Exception as exc:
+        s.attributes["error"] = type(exc).__name__
+        raise
+    finally:
+        s.duration_s = time.perf_counter() - began
+        _current.reset(token)
+        _export(s)
+
+
+def _export(s):
+    with _lock:
+        SPANS.append(s)
+        if QUERY_LOG:
+            record = asdict(s)
+            record.pop("executed")
+            line = json.dumps(record, default=str)
+            if QUERY_LOG == "-":
+                print(line, file=sys.stderr)
+            else:
+                with open(QUERY_LOG, "a") as f:
+                    f.write(line + "\n")
+
+
+def traced(cache):
+    """Wrap a caching decorator, e.g. ``@traced(st.cache_data(ttl=3600))``.
+
+    Each call records a getter span whose ``cache`` attribute is ``miss`` when
+    the function body actually ran and ``hit`` when the cache answered.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            s = _current.get()
+            if s is not None:
+                s.executed = True
+            return fn(*args, **kwargs)
+
+        cached = cache(body)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(fn.__name__, "getter") as s:
+                result = cached(*args, **kwargs)
+                s.attributes["cache"] = "miss" if s.executed else "hit"
+            return result
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorate
+
+
+def traced_query(run, sql, params=()):
+    """Run ``run(sql, params=params)`` inside a query span and record what came back"""
+    with span("query", "query", fingerprint=fingerprint(sql), sql=normalize_sql(sql)[:500], params=list(params)) as s:
+        df = run(sql, params=params)
+        s.attributes.update(
+            rows=len(df),
+            bytes=int(df.memory_usage(deep=True).sum()),
+            query_id=df.attrs.get("query_id"),
+        )
+    return df
+
+
+def trace_spans(trace_id):
+    """Spans of one trace (e.g. one rerun), oldest first"""
+    with _lock:
+        return [s for s in SPANS if s.trace_id == trace_id]
@@ -0,0 +1,61 @@
+"""Source-table tracking for targeted cache invalidation.
+
+Every result ``run_query`` returns is recorded against the tables its SQL
+reads (``FANGRAPH.<SCHEMA>.<TABLE>``) and the time its data was read from
+the warehouse. Cached getters collect these sources for the results they
+build, including sources inherited through other getters. When the
+tables' ``LAST_ALTERED`` times are refreshed into ``LAST_ALTERED``, only
+the results whose sources changed after their data was read count as
+stale. Summaries and disk-cache entries are checked the same way.
+"""
+import contextvars
+import re
+from contextlib import contextmanager
+
+TABLE_PATTERN = re.compile(r"\bFANGRAPH\.(\w+)\.(\w+)\b", re.IGNORECASE)
+
+# Table -> epoch seconds it was last altered, as of the last source check
+LAST_ALTERED = {}
+
+_sources = contextvars.ContextVar("fangraph_sources", default=None)
+
+
+class Sources:
+    """Tables behind a result and the oldest time any of its data was read"""
+
+    def __init__(self):
+        self.tables = set()
+        self.as_of = None
+
+    def add(self, tables, as_of):
+        self.tables.update(tables)
+        if as_of is not None:
+            self.as_of = as_of if self.as_of is None else min(self.as_of, as_of)
+
+
+def tables_in(sql):
+    """Fully qualified FANGRAPH tables referenced by ``sql``"""
+    return frozenset(f"FANGRAPH.{schema.upper()}.{table.upper()}" for schema, table in TABLE_PATTERN.findall(sql))
+
+
+@contextmanager
+def collect_sources():
+    """Collect the sources of every result recorded inside the block"""
+    sources = Sources()
+    token = _sources.set(sources)
+    try:
+        yield sources
+    finally:
+        _sources.reset(token)
+
+
+def record(tables, as_of):
+    """Note that the result being built depends on ``tables`` read at ``as_of``"""
+    sources = _sources.get()
+    if sources is not None:
+        sources.add(tables, as_of)
+
+
+def changed_since(tables, as_of):
+    """Whether any of ``tables`` was altered after ``as_of``"""
+    return as_of is not None and any(LAST_ALTERED.get(table, 0) > as_of for table in tables)
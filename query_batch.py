@@ -0,0 +1,150 @@
+"""Concurrent fan-out for the queries a page needs.
+
+On a cold cache the dashboard used to wait for the sum of its query
+latencies. ``run_batch`` submits every task at once on a thread pool and
+collects results as they finish, so a cold load is bounded by the slowest
+query instead. ``SingleFlight`` collapses identical queries that are in
+flight at the same time - e.g. many sessions missing the cache after a
+deploy - into one execution shared by every caller. ``LatencyConnection``
+is a local stand-in for ``st.connection("snowflake")`` that injects
+artificial latency, for trying the batch layer without a warehouse.
+"""
+import copy
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import partial
+
+
+def run_batch(tasks, max_workers=None, initializer=None, return_exceptions=False):
+    """Run named zero-argument callables concurrently.
+
+    Returns ``{name: result}``. If a task raises, the first error is re-raised
+    once every task has finished, unless ``return_exceptions`` is set, in
+    which case the exception is returned as that task's result.
+    """
+    if not tasks:
+        return {}
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max_workers or len(tasks), initializer=initializer) as pool:
+        futures = {pool.submit(task): name for name, task in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except Exception as exc:
+                if not return_exceptions:
+                    errors.append(exc)
+                results[name] = exc
+    if errors:
+        raise errors[0]
+    return {name: results[name] for name in tasks}
+
+
+def run_query_batch(run_query, queries, max_workers=None):
+    """Run ``{name: sql}`` through ``run_query`` concurrently and return ``{name: DataFrame}``"""
+    return run_batch({name: partial(run_query, sql) for name, sql in queries.items()}, max_workers=max_workers)
+
+
+class SingleFlight:
+    """Execute identical concurrent calls once and share the result.
+
+    ``do(key, fn)`` runs ``fn`` unless a call with the same key is already in
+    flight, in which case it waits for that call. Every caller gets a private
+    copy of the result (or the exception). ``executed`` and ``coalesced`` count the
+    calls that ran and the waiters that were spared.
+    """
+
+    def __init__(self):
+        self.executed = 0
+        self.coalesced = 0
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+                self.executed += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            return copy.deepcopy(call.result())
+        try:
+            result = fn()
+        except BaseException as exc:
+            call.set_exception(exc)
+            raise
+        else:
+            call.set_result(result)
+            # The caller may mutate its result while waiters are still copying theirs
+            return copy.deepcopy(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        with self._lock:
+            return {"executed": self.executed, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+    def reset(self):
+        with self._lock:
+            self.executed = 0
+            self.coalesced = 0
+
+
+# Process-wide, so every session's identical queries share one flight
+QUERY_FLIGHT = SingleFlight()
+
+
+class LatencyConnection:
+    """Stand-in connection whose ``query`` sleeps before answering.
+
+    ``answer(sql, **kwargs)`` produces the result (e.g. a DataFrame). ``latency``
+    is the artificial per-query delay in seconds. Calls are counted so a
+    caller can check how many queries actually ran. Any other attribute
+    (e.g. ``arrow_batches``) is looked up on ``delegate``.
+    """
+
+    def __init__(self, answer, latency=0.5, delegate=None):
+        self.answer = answer
+        self.latency = latency
+        self.delegate = delegate
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        delegate = self.__dict__.get("delegate")
+        if delegate is None:
+            raise AttributeError(name)
+        return getattr(delegate, name)
+
+    def query(self, sql, **kwargs):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        return self.answer(sql, **kwargs)
+
+
+if __name__ == "__main__":
+    conn = LatencyConnection(lambda sql, **kwargs: sql, latency=0.5)
+    queries = {f"q{i}": f"SELECT {i}" for i in range(12)}
+
+    start = time.perf_counter()
+    for sql in queries.values():
+        conn.query(sql)
+    sequential = time.perf_counter() - start
+
+    start = time.perf_counter()
+    run_query_batch(conn.query, queries)
+    batched = time.perf_counter() - start
+
+    print(f"{len(queries)} queries @ {conn.latency}s: sequential {sequential:.2f}s, batched {batched:.2f}s")
+
+    conn.calls = 0
+    flight = SingleFlight()
+    run_batch({f"session{i}": partial(flight.do, "SELECT 1", partial(conn.query, "SELECT 1")) for i in range(12)})
+    print(f"12 concurrent identical queries: {conn.calls} executed, {flight.coalesced} coalesced")
@@ -0,0 +1,126 @@
+"""Canonical, bind-parameterized SQL for the dashboard's aggregate queries.
+
+Building SQL with f-strings puts filter values into the query text, so
+every OpCo, date or year produces different text. That defeats Snowflake's
+result cache, which matches on exact text, and it fragments our own cache
+keys. ``select`` renders a measure/dimension/filter combination in one
+fixed layout, with filters sorted and values bound as ``?`` parameters.
+Equivalent requests therefore produce identical SQL, and only the
+parameters differ.
+
+Both backends take qmark parameters: DuckDB natively, and Snowflake with
+``snowflake.connector.paramstyle = "qmark"`` (set by ``backends.connect``).
+"""
+from typing import NamedTuple
+
+# OpCo label -> FANGRAPH *_FAN_INDICATOR prefix (also the fan cube column name)
+OPCO_COLUMNS = {
+    "Commerce": "COMMERCE",
+    "Topps Digital": "TOPPS_DIGITAL",
+    "Topps.com": "TOPPS_COM",
+    "FBG (Sportsbook)": "FBG",
+    "FanApp": "FANAPP",
+    "Live": "LIVE",
+    "Collect": "COLLECT",
+    "Events": "EVENTS",
+}
+
+
+class Query(NamedTuple):
+    sql: str
+    params: tuple = ()
+
+
+class Filter(NamedTuple):
+    expr: str
+    op: str
+    value: object = None
+
+    def render(self):
+        if self.op in ("IS NULL", "IS NOT NULL"):
+            return f"{self.expr} {self.op}", ()
+        if self.op == "CONTAINS":
+            return f"ARRAY_CONTAINS(?::VARIANT, {self.expr})", (self.value,)
+        if self.op == "BOUND":
+            return self.expr, (self.value,)
+        return f"{self.expr} {self.op} ?", (self.value,)
+
+
+def eq(expr, value):
+    return Filter(expr, "=", value)
+
+
+def gt(expr, value):
+    return Filter(expr, ">", value)
+
+
+def gte(expr, value):
+    return Filter(expr, ">=", value)
+
+
+def lt(expr, value):
+    return Filter(expr, "<", value)
+
+
+def contains(array_expr, value):
+    """Rows whose ARRAY column ``array_expr`` holds ``value``"""
+    return Filter(array_expr, "CONTAINS", value)
+
+
+def not_null(expr):
+    return Filter(expr, "IS NOT NULL")
+
+
+def bound(expr, value):
+    """Rows where the boolean ``expr``, holding one ``?`` placeholder, is true with ``value`` bound to it"""
+    return Filter(expr, "BOUND", value)
+
+
+# The indicator of the OpCo label bound to the ?, so one SQL text serves every OpCo
+OPCO_INDICATOR = "COALESCE(CASE ? {} END, FALSE)".format(
+    " ".join(f"WHEN '{opco}' THEN {col}_FAN_INDICATOR" for opco, col in OPCO_COLUMNS.items())
+)
+
+
+def opco_filters(opco):
+    """Filters selecting the fans of one OpCo label - none for ALL (or an unknown label)"""
+    if opco not in OPCO_COLUMNS:
+        return []
+    return [bound(OPCO_INDICATOR, opco)]
+
+
+def select(table, measures, dimensions=None, filters=(), joins=(), order_by=(), limit=None):
+    """Render one aggregate query.
+
+    ``measures`` and ``dimensions`` map output column -> SQL expression and
+    keep their order. ``filters`` are ANDed in sorted order with their
+    values bound. ``joins`` are appended to the FROM clause as-is (e.g.
+    a LATERAL FLATTEN). Dimensions are grouped with GROUP BY ALL.
+    """
+    dimensions = dimensions or {}
+    columns = [f"{expr} as {alias}" for alias, expr in {**dimensions, **measures}.items()]
+    lines = ["SELECT", "    " + ",\n    ".join(columns), f"FROM {', '.join([table, *joins])}"]
+    params = []
+    # Sorted by clause and then bound values, so equal clauses with different
+    # values always bind in the same order
+    rendered = sorted((f.render() for f in dict.fromkeys(filters)), key=lambda item: (item[0], repr(item[1])))
+    if rendered:
+        lines.append("WHERE " + "\n    AND ".join(clause for clause, _ in rendered))
+        for _, values in rendered:
+            params.extend(values)
+    if dimensions:
+        lines.append("GROUP BY ALL")
+    if order_by:
+        lines.append("ORDER BY " + ", ".join(order_by))
+    if limit is not None:
+        lines.append(f"LIMIT {int(limit)}")
+    return Query("\n".join(lines), tuple(params))
+
+
+def union_all(queries):
+    """Concatenate queries with UNION ALL - qmark parameters simply follow in order"""
+    queries = list(queries)
+    return Query(
+        "\nUNION ALL\n".join(query.sql for query in queries),
+        tuple(param for query in queries for param in query.params),
+    )
@@ -0,0 +1,144 @@
+"""Disk-backed query result cache shared across restarts and replicas.
+
+``st.cache_data`` lives in process memory, so every redeploy, SiS container
+recycle or extra replica starts cold. This tier stores each query result as
+a Parquet file named by a hash of the normalized SQL and its parameters
+(including which backend ran it) in FANGRAPH_RESULT_CACHE_DIR - a local
+directory by default, or a shared mount so replicas warm each other.
+
+Entries expire after FANGRAPH_RESULT_CACHE_TTL seconds. Files are written to
+a temporary name and renamed into place, so readers never see a partial
+entry, and the directory is kept under FANGRAPH_RESULT_CACHE_MB by evicting
+the least recently used entries (reads refresh a file's mtime).
+"""
+import functools
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import normalize_sql
+
+RESULT_CACHE_ENABLED = os.environ.get("FANGRAPH_RESULT_CACHE", "1") != "0"
+RESULT_CACHE_DIR = os.environ.get(
+    "FANGRAPH_RESULT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "fangraph_result_cache")
+)
+RESULT_CACHE_TTL = float(os.environ.get("FANGRAPH_RESULT_CACHE_TTL", "3600"))
+RESULT_CACHE_MB = float(os.environ.get("FANGRAPH_RESULT_CACHE_MB", "512"))
+
+
+def cache_key(sql, params=()):
+    """Stable key for a query: normalized SQL plus its parameters"""
+    payload = json.dumps([normalize_sql(sql), list(params)], default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Parquet files in ``directory``, bounded to ``max_bytes`` with LRU eviction"""
+
+    def __init__(self, directory, ttl=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MB * 1024 * 1024):
+        self.directory = Path(directory)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return self.directory / f"{key}.parquet"
+
+    def get(self, sql, params=()):
+        """Cached DataFrame for ``sql``/``params``, or None if absent or expired"""
+        path = self.path(cache_key(sql, params))
+        try:
+            table = pq.read_table(path)
+        except (OSError, pa.ArrowInvalid):
+            return None
+        created = float((table.schema.metadata or {}).get(b"fangraph_created", b"0"))
+        if self.ttl and time.time() - created > self.ttl:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        df = table.to_pandas(split_blocks=True, self_destruct=True)
+        df.attrs["cached_at"] = created
+        return df
+
+    def put(self, sql, df, params=()):
+        """Atomically store ``df`` for ``sql``/``params`` and evict down to the size bound.
+
+        Results Arrow cannot represent, or a full/read-only disk, are skipped -
+        the cache is an optimization, never a reason for a query to fail.
+        """
+        path = self.path(cache_key(sql, params))
+        tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            table = table.replace_schema_metadata({
+                **(table.schema.metadata or {}),
+                b"fangraph_created": str(time.time()).encode(),
+                b"fangraph_sql": normalize_sql(sql)[:2000].encode(),
+            })
+            self.directory.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table, tmp)
+            os.replace(tmp, path)
+        except (OSError, pa.ArrowException):
+            return
+        finally:
+            try:
+                tmp.unlink(missing_ok=True)
+            except OSError:
+                # e.g. a parent of the cache directory is a file
+                pass
+        self.evict()
+
+    def entries(self):
+        """(path, size, mtime) of every entry, least recently used first"""
+        entries = []
+        for path in self.directory.glob("*.parquet"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:  # Evicted by another process
+                continue
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in ``max_bytes``"""
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            for path, size, _ in entries:
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            path.unlink(missing_ok=True)
+
+
+@functools.lru_cache(maxsize=None)
+def default_cache():
+    """The process-wide cache configured by the FANGRAPH_RESULT_CACHE_* settings, or None if disabled"""
+    if not RESULT_CACHE_ENABLED:
+        return None
+    return ResultCache(RESULT_CACHE_DIR)
+
+
+def cached_query(run, sql, params=()):
+    """``run(sql)`` through the disk cache - the result is read from or written to it"""
+    cache = default_cache()
+    if cache is None:
+        return run(sql)
+    df = cache.get(sql, params)
+    if df is None:
+        df = run(sql)
+        cache.put(sql, df, params)
+    return df
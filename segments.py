@@ -0,0 +1,138 @@
+"""OpCo segments encoded as an 8-bit mask of the ``*_FAN_INDICATOR`` flags.
+
+The fan cube carries one ``OPCO_MASK`` column instead of eight booleans:
+bit ``i`` is set when the fan belongs to the ``i``-th OpCo of
+``OPCO_COLUMNS``. The cube is aggregated once per mask, league, age and
+state, so there are at most 256 OpCo combinations. Any AND/OR/NOT
+combination of OpCos (a ``Segment``) is then answered locally with
+vectorized bit operations on that column, with no query per combination.
+"""
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from query_builder import OPCO_COLUMNS, eq, gt
+
+# OpCo label -> its bit in OPCO_MASK
+OPCO_BITS = {opco: 1 << i for i, opco in enumerate(OPCO_COLUMNS)}
+
+MATCH_ALL = "all"
+MATCH_ANY = "any"
+
+
+def mask_sql():
+    """SQL expression packing the OpCo indicators into OPCO_MASK"""
+    return " + ".join(
+        f"CASE WHEN {col}_FAN_INDICATOR THEN {OPCO_BITS[opco]} ELSE 0 END" for opco, col in OPCO_COLUMNS.items()
+    )
+
+
+def bits(opcos):
+    """Mask with the bits of ``opcos`` set"""
+    return sum(OPCO_BITS[opco] for opco in set(opcos))
+
+
+def opcos_in(mask):
+    """OpCo labels whose bit is set in ``mask``"""
+    return [opco for opco, bit in OPCO_BITS.items() if mask & bit]
+
+
+class Segment(NamedTuple):
+    """Fans in ``include`` (all of them, or any with ``match="any"``) and in none of ``exclude``.
+
+    An empty ``include`` means every fan.
+    """
+    include: tuple = ()
+    exclude: tuple = ()
+    match: str = MATCH_ALL
+
+    @property
+    def is_all(self):
+        return not self.include and not self.exclude
+
+    def label(self):
+        if self.is_all:
+            return "All OpCos"
+        joiner = " AND " if self.match == MATCH_ALL else " OR "
+        parts = [joiner.join(self.include)] if self.include else []
+        parts += [f"NOT {opco}" for opco in self.exclude]
+        return ", ".join(parts)
+
+    def matches(self, masks):
+        """Boolean array: which of the OPCO_MASK values in ``masks`` fall in this segment"""
+        masks = np.asarray(masks, dtype=np.int64)
+        include, exclude = bits(self.include), bits(self.exclude)
+        if not include:
+            selected = np.ones(masks.shape, dtype=bool)
+        elif self.match == MATCH_ALL:
+            selected = (masks & include) == include
+        else:
+            selected = (masks & include) != 0
+        return selected & ((masks & exclude) == 0)
+
+    def filters(self):
+        """query_builder filters selecting this segment's fans from FANGRAPH"""
+        filters = []
+        if self.match == MATCH_ALL or len(self.include) == 1:
+            filters += [eq(f"{OPCO_COLUMNS[opco]}_FAN_INDICATOR", True) for opco in self.include]
+        elif self.include:
+            flags = " + ".join(
+                f"CASE WHEN {OPCO_COLUMNS[opco]}_FAN_INDICATOR THEN 1 ELSE 0 END" for opco in sorted(self.include)
+            )
+            filters.append(gt(f"({flags})", 0))
+        filters += [eq(f"COALESCE({OPCO_COLUMNS[opco]}_FAN_INDICATOR, FALSE)", False) for opco in self.exclude]
+        return filters
+
+
+ALL_FANS = Segment()
+
+
+def as_segment(value):
+    """A Segment from a Segment, an OpCo label, or "ALL" (unknown labels mean every fan)"""
+    if isinstance(value, Segment):
+        return value
+    if value in OPCO_BITS:
+        return Segment(include=(value,))
+    return ALL_FANS
+
+
+def segment_counts(cube):
+    """Fans per OPCO_MASK value (at most 256 rows) from a fan cube slice"""
+    return cube.groupby('OPCO_MASK')['FAN_COUNT'].sum()
+
+
+def opco_counts(cube):
+    """Fans per OpCo label from a fan cube slice - each OpCo sums the masks with its bit set"""
+    counts = segment_counts(cube)
+    masks = counts.index.to_numpy(dtype=np.int64)
+    return {opco: counts.to_numpy()[(masks & bit) != 0].sum() for opco, bit in OPCO_BITS.items()}
+
+
+def overlap_matrix(counts):
+    """OpCo x OpCo frame of fans in both (the diagonal is each OpCo's total) from ``segment_counts``.
+
+    One matrix product over the at most 256 masks: membership^T @ (membership * fans).
+    """
+    masks = counts.index.to_numpy(dtype=np.int64)
+    membership = ((masks[:, None] & np.array(list(OPCO_BITS.values()))) != 0).astype(np.int64)
+    both = membership.T @ (membership * counts.to_numpy(dtype=np.int64)[:, None])
+    return pd.DataFrame(both, index=list(OPCO_BITS), columns=list(OPCO_BITS))
+
+
+def intersections(counts, top=None):
+    """Exact OpCo combinations (UpSet rows) from ``segment_counts``, largest first.
+
+    OPCO_MASK / OPCOS (labels) / DEGREE (number of OpCos) / FAN_COUNT; fans in
+    no OpCo (mask 0) are left out.
+    """
+    counts = counts[counts.index != 0].sort_values(ascending=False)
+    if top is not None:
+        counts = counts.head(top)
+    masks = counts.index.to_numpy(dtype=np.int64)
+    return pd.DataFrame({
+        'OPCO_MASK': masks,
+        'OPCOS': [opcos_in(mask) for mask in masks],
+        'DEGREE': [bin(mask).count("1") for mask in masks],
+        'FAN_COUNT': counts.to_numpy(),
+    })
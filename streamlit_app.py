@@ -3,11 +3,37 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import pandas as pd
+import numpy as np
+import pyarrow as pa
 import os
+import functools
+import threading
+import time
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from backends import backend_key, connect, source_versions
+from figure_cache import cached_figure
+from instrumentation import normalize_sql, span, trace_spans, traced, traced_query
+from query_batch import QUERY_FLIGHT, run_batch
+from query_builder import OPCO_COLUMNS, Query, gte, lt, not_null, select, union_all
+import drilldown
+import export
+import figure_cache
+import hll
+import segments
+import invalidation
+import result_cache
+import summaries
+from swr_cache import SWR_ENABLED, invalidate, quiet_context, source_tables, swr_cache
 
 # Detect if running in Snowflake (SiS) or locally
 RUNNING_IN_SNOWFLAKE = os.environ.get("SNOWFLAKE_ACCOUNT") is not None
 
+# Lazy tabs: only the open tab runs its queries and builds its figures
+LAZY_TABS = os.environ.get("FANGRAPH_LAZY_TABS", "1") != "0"
+
+# Query timing panel in the sidebar (also enabled with ?debug=1)
+DEBUG_PANEL = os.environ.get("FANGRAPH_DEBUG") == "1"
+
 # Page config
 st.set_page_config(
     page_title="FanGraph Insights Dashboard",
@@ -148,6 +174,21 @@ st.markdown("""
     .stTabs [aria-selected="true"] {
         background-color: #E31837 !important;
     }
+
+    /* Lazy tab navigation (radio styled as tabs) */
+    div[role="radiogroup"] {
+        gap: 8px;
+    }
+
+    div[role="radiogroup"] > label {
+        background-color: #1A1A1A;
+        border-radius: 8px;
+        padding: 10px 20px;
+    }
+
+    div[role="radiogroup"] > label:has(input:checked) {
+        background-color: #E31837;
+    }
     
     /* Metric styling */
     [data-testid="stMetricValue"] {
@@ -195,331 +236,452 @@ PLOTLY_LAYOUT = dict(
 # ============== SNOWFLAKE CONNECTION ==============
 @st.cache_resource
 def get_connection():
-    """Get Snowflake connection - works both in SiS and locally"""
-    return st.connection("snowflake")
+    """Get the query backend - Snowflake in SiS and locally, or DuckDB (FANGRAPH_BACKEND)"""
+    return connect()
+
+def run_query(query, params=(), summary=None):
+    """Execute query (with ``?`` bind parameters) and return pandas DataFrame.
 
-def run_query(query):
-    """Execute query and return pandas DataFrame"""
+    Queries tagged with a ``summary`` name are answered from the materialized
+    summary built by build_summaries.py when it is fresh, else run live.
+    ``df.attrs['as_of']`` is when the data was actually read from the warehouse;
+    summaries and disk-cached results older than a change to their source
+    tables are skipped.
+    """
+    params = tuple(params)
+    tables = invalidation.tables_in(query)
+    if summary and summaries.USE_SUMMARIES and not summaries.building():
+        with span("summary", "summary", summary=summary) as s:
+            df = summaries.read_summary(summary, query, params=params)
+            if df is not None and invalidation.changed_since(tables, df.attrs['built_at'].timestamp()):
+                df = None
+            s.attributes['cache'] = "miss" if df is None else "hit"
+            if df is not None:
+                s.attributes.update(rows=len(df), built_at=df.attrs['built_at'].isoformat())
+                df.attrs['as_of'] = df.attrs['built_at'].timestamp()
+                invalidation.record(tables, df.attrs['as_of'])
+                return df
     conn = get_connection()
-    return conn.query(query)
+    cache = result_cache.default_cache()
+    cache_params = (backend_key(), *params)
+    if cache is not None and not summaries.building():
+        with span("result_cache", "result_cache") as s:
+            df = cache.get(query, cache_params)
+            if df is not None and invalidation.changed_since(tables, df.attrs['cached_at']):
+                df = None
+            s.attributes['cache'] = "miss" if df is None else "hit"
+        if df is not None:
+            df.attrs['as_of'] = df.attrs['cached_at']
+            invalidation.record(tables, df.attrs['as_of'])
+            return df
+    
+    def fetch():
+        df = traced_query(conn.query, query, params)
+        df.attrs['as_of'] = time.time()
+        if cache is not None:
+            cache.put(query, df, cache_params)
+        return df
+    
+    # Identical SQL already running for another session is waited on, not re-run
+    df = QUERY_FLIGHT.do((normalize_sql(query), repr(cache_params)), fetch)
+    invalidation.record(tables, df.attrs['as_of'])
+    if summary and summaries.building():
+        summaries.write_summary(summary, query, df, params=params)
+    return df
 
 # ============== DATA QUERIES ==============
-@st.cache_data(ttl=3600, show_spinner="Fetching data from Snowflake...")
+
+LEAGUES = ["NFL", "MLB", "NBA", "NCAA", "NHL"]
+
+@traced(swr_cache(ttl=3600, show_spinner="Fetching data from Snowflake..."))
+def get_fan_cube():
+    """Get the pre-aggregated fan cube - single scan of FANGRAPH.
+
+    One row per combination of OpCo indicators, league flags, age range and
+    (valid two-letter) state, with the number of fans in that cell. Every
+    FANGRAPH count on the dashboard is sliced from this frame locally.
+    """
+    query = select(
+        "FANGRAPH.ADMIN.FANGRAPH",
+        measures={"FAN_COUNT": "COUNT(*)"},
+        dimensions={
+            "OPCO_MASK": segments.mask_sql(),
+            **{league: f"COALESCE(FANGRAPH_PREFERENCE_{league}, FALSE)" for league in LEAGUES},
+            "AGE_RANGE": "FANGRAPH_AGE_RANGE",
+            "STATE": "CASE WHEN LENGTH(FANGRAPH_STATE) = 2 THEN FANGRAPH_STATE END",
+        },
+    )
+    df = run_query(*query, summary="fan_cube")
+    df['OPCO_MASK'] = pd.to_numeric(df['OPCO_MASK']).astype('uint8')
+    df['FAN_COUNT'] = pd.to_numeric(df['FAN_COUNT'])
+    return df
+
+def slice_fan_cube(segment=segments.ALL_FANS):
+    """Get the fan cube rows for fans of one OpCo segment (or label; every row for ALL)"""
+    cube = get_fan_cube()
+    segment = segments.as_segment(segment)
+    if segment.is_all:
+        return cube
+    return cube[segment.matches(cube['OPCO_MASK'])]
+
+def league_counts(cube):
+    """Sum a fan cube slice into the LEAGUE / FAN_COUNT frame used by the charts"""
+    counts = cube[LEAGUES].mul(cube['FAN_COUNT'], axis=0).sum()
+    df = pd.DataFrame({'LEAGUE': LEAGUES, 'FAN_COUNT': counts[LEAGUES].values})
+    return df.sort_values('FAN_COUNT', ascending=False)
+
+def age_counts(cube):
+    """Sum a fan cube slice into the AGE_RANGE / FAN_COUNT frame, largest first"""
+    df = cube.groupby('AGE_RANGE', as_index=False)['FAN_COUNT'].sum()
+    return df.sort_values('FAN_COUNT', ascending=False).reset_index(drop=True)
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
 def get_total_fans():
     """Get total fan count"""
-    df = run_query("SELECT COUNT(*) as CNT FROM FANGRAPH.ADMIN.FANGRAPH")
-    return df['CNT'].iloc[0]
+    return get_fan_cube()['FAN_COUNT'].sum()
 
-@st.cache_data(ttl=3600, show_spinner="Fetching OpCo data...")
+@traced(swr_cache(ttl=3600, show_spinner=False))
 def get_opco_breakdown():
-    """Get fan breakdown by OpCo - optimized single scan"""
-    query = """
-    SELECT 
-        COUNT(*) as TOTAL_FANS,
-        SUM(CASE WHEN COMMERCE_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as COMMERCE,
-        SUM(CASE WHEN TOPPS_DIGITAL_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as TOPPS_DIGITAL,
-        SUM(CASE WHEN TOPPS_COM_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as TOPPS_COM,
-        SUM(CASE WHEN FBG_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as FBG,
-        SUM(CASE WHEN FANAPP_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as FANAPP,
-        SUM(CASE WHEN LIVE_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as LIVE,
-        SUM(CASE WHEN COLLECT_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as COLLECT,
-        SUM(CASE WHEN EVENTS_FAN_INDICATOR = TRUE THEN 1 ELSE 0 END) as EVENTS
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    """
-    result = run_query(query).iloc[0]
-    data = [
-        {'OPCO': 'Total Fans', 'FAN_COUNT': result['TOTAL_FANS']},
-        {'OPCO': 'Commerce', 'FAN_COUNT': result['COMMERCE']},
-        {'OPCO': 'Topps Digital', 'FAN_COUNT': result['TOPPS_DIGITAL']},
-        {'OPCO': 'Topps.com', 'FAN_COUNT': result['TOPPS_COM']},
-        {'OPCO': 'FBG (Sportsbook)', 'FAN_COUNT': result['FBG']},
-        {'OPCO': 'FanApp', 'FAN_COUNT': result['FANAPP']},
-        {'OPCO': 'Live', 'FAN_COUNT': result['LIVE']},
-        {'OPCO': 'Collect', 'FAN_COUNT': result['COLLECT']},
-        {'OPCO': 'Events', 'FAN_COUNT': result['EVENTS']},
-    ]
+    """Get fan breakdown by OpCo - sliced from the fan cube"""
+    cube = get_fan_cube()
+    data = [{'OPCO': 'Total Fans', 'FAN_COUNT': cube['FAN_COUNT'].sum()}]
+    data += [{'OPCO': opco, 'FAN_COUNT': count} for opco, count in segments.opco_counts(cube).items()]
     df = pd.DataFrame(data)
     df = df.sort_values('FAN_COUNT', ascending=False)
     return df
 
-@st.cache_data(ttl=3600, show_spinner="Fetching commerce data...")
-def get_commerce_trends():
-    """Get 24-month commerce trends"""
-    query = """
-    SELECT 
-        DATE_TRUNC('MONTH', ORDER_TS) as MONTH,
-        COUNT(DISTINCT ORDER_REF_NUM) as ORDERS,
-        COUNT(DISTINCT FANGRAPH_ID) as CUSTOMERS,
-        SUM(NET_DEMAND) as REVENUE
-    FROM FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE
-    WHERE ORDER_TS >= DATEADD('MONTH', -24, CURRENT_DATE())
-    GROUP BY DATE_TRUNC('MONTH', ORDER_TS)
-    ORDER BY MONTH
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_opco_overlap():
+    """Get fans in both of every pair of OpCos (the diagonal is each OpCo's total) - from the fan cube's OpCo masks"""
+    return segments.overlap_matrix(segments.segment_counts(get_fan_cube()))
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_opco_intersections():
+    """Get every exact combination of OpCos with its fan count, largest first"""
+    return segments.intersections(segments.segment_counts(get_fan_cube()))
+
+# Calendar months before the current one shown on the Commerce Trends tab
+COMMERCE_MONTHS = 24
+# Months re-queried on every refresh: the current month plus the one before it,
+# which still receives late orders and adjustments
+COMMERCE_OPEN_MONTHS = 2
+# Keep a persisted per-month history and only re-query the open months
+COMMERCE_INCREMENTAL = os.environ.get("FANGRAPH_COMMERCE_INCREMENTAL", "1") != "0"
+
+def commerce_trends_query(start):
+    """Monthly orders, customers and net demand for orders placed on or after ``start``"""
+    return select(
+        "FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE",
+        measures={
+            "ORDERS": "COUNT(DISTINCT ORDER_REF_NUM)",
+            "CUSTOMERS": "COUNT(DISTINCT FANGRAPH_ID)",
+            "REVENUE": "SUM(NET_DEMAND)",
+        },
+        dimensions={"MONTH": "DATE_TRUNC('MONTH', ORDER_TS)"},
+        filters=[gte("ORDER_TS", start)],
+        order_by=["MONTH"],
+    )
+
+def open_months_start(now):
+    """First month still open at ``now`` - months before it are final"""
+    return now.normalize().replace(day=1) - pd.DateOffset(months=COMMERCE_OPEN_MONTHS - 1)
+
+def refresh_monthly_history(name, build_query, prepare, window_start, now):
+    """Re-query only the open (or missing) months and merge them into the persisted history.
+
+    Closed months keep exactly what they were stored with; the history lives
+    in the ``name`` summary, each row stamped with when it was fetched so a
+    month that was still open then is fetched again.
     """
-    df = run_query(query)
+    # Same SQL text for every start date - only the bound parameter differs
+    template = build_query(None).sql
+    history = summaries.read_summary(name, template, max_age_hours=0)
+    start = window_start
+    if history is not None and len(history) > 0 and history['MONTH'].min() <= window_start:
+        fetched_open_start = (history['FETCHED_AT'].dt.to_period('M') - (COMMERCE_OPEN_MONTHS - 1)).dt.to_timestamp()
+        still_open = history.loc[history['MONTH'] >= fetched_open_start, 'MONTH']
+        next_month = history['MONTH'].max() + pd.DateOffset(months=1)
+        start = min([open_months_start(now), next_month] + ([still_open.min()] if len(still_open) else []))
+    
+    rows = run_query(*build_query(start.date()))
+    # When the rows were read from the warehouse - older than now if the disk cache served them
+    as_of = rows.attrs.get('as_of')
+    fresh = prepare(rows)
+    fresh['FETCHED_AT'] = now if as_of is None else min(now, pd.Timestamp.fromtimestamp(as_of))
+    
+    if start > window_start:
+        fresh = pd.concat([history[history['MONTH'] < start], fresh], ignore_index=True)
+    df = fresh[fresh['MONTH'] >= window_start].sort_values('MONTH', kind='stable').reset_index(drop=True)
+    try:
+        summaries.write_summary(name, template, df)
+    except (OSError, pa.ArrowException):
+        # A read-only summary directory only costs the incremental saving next time
+        pass
+    return df
+
+def monthly_rows(name, build_query, prepare):
+    """Rows of a per-month query over the commerce window - incrementally refreshed unless disabled"""
+    now = pd.Timestamp.now()
+    window_start = now.normalize().replace(day=1) - pd.DateOffset(months=COMMERCE_MONTHS)
+    if COMMERCE_INCREMENTAL:
+        return refresh_monthly_history(name, build_query, prepare, window_start, now).drop(columns='FETCHED_AT')
+    return prepare(run_query(*build_query(window_start.date()), summary=f"{name}_full"))
+
+def prepare_commerce_trends(df):
     df['MONTH'] = pd.to_datetime(df['MONTH'])
+    for col in ('ORDERS', 'CUSTOMERS'):
+        df[col] = pd.to_numeric(df[col]).astype('int64')
+    df['REVENUE'] = pd.to_numeric(df['REVENUE'], errors='coerce').astype(float)
     return df
 
-@st.cache_data(ttl=3600, show_spinner="Fetching NFL data...")
-def get_nfl_teams():
-    """Get top 15 NFL teams by fan count"""
-    query = """
-    SELECT 
-        f.value::STRING as NFL_TEAM,
-        COUNT(*) as FAN_COUNT
-    FROM FANGRAPH.ADMIN.FANGRAPH,
-        LATERAL FLATTEN(input => FANGRAPH_PREFERENCE_NFL_TEAMS) f
-    WHERE FANGRAPH_PREFERENCE_NFL_TEAMS IS NOT NULL
-    GROUP BY f.value::STRING
-    ORDER BY FAN_COUNT DESC
-    LIMIT 15
+# Estimate distinct orders/customers from mergeable HyperLogLog sketches instead of COUNT(DISTINCT)
+APPROX_DISTINCT = os.environ.get("FANGRAPH_APPROX_DISTINCT") == "1"
+
+def commerce_revenue_query(start):
+    """Monthly net demand only - the cheap part of the commerce trends query"""
+    return select(
+        "FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE",
+        measures={"REVENUE": "SUM(NET_DEMAND)"},
+        dimensions={"MONTH": "DATE_TRUNC('MONTH', ORDER_TS)"},
+        filters=[gte("ORDER_TS", start)],
+        order_by=["MONTH"],
+    )
+
+def commerce_sketch_query(start):
+    """Per-month HyperLogLog registers (MONTH / METRIC / IDX / RANK) for orders and customers"""
+    parts = []
+    for metric, column in (("ORDERS", "ORDER_REF_NUM"), ("CUSTOMERS", "FANGRAPH_ID")):
+        index, rank = hll.register_sql(column)
+        parts.append(select(
+            "FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE",
+            measures={"RANK": f"MAX({rank})"},
+            dimensions={"MONTH": "DATE_TRUNC('MONTH', ORDER_TS)", "METRIC": f"'{metric}'", "IDX": index},
+            filters=[gte("ORDER_TS", start), not_null(column)],
+        ))
+    return union_all(parts)
+
+def prepare_commerce_revenue(df):
+    df['MONTH'] = pd.to_datetime(df['MONTH'])
+    df['REVENUE'] = pd.to_numeric(df['REVENUE'], errors='coerce').astype(float)
+    return df
+
+def prepare_commerce_sketches(df):
+    df['MONTH'] = pd.to_datetime(df['MONTH'])
+    df['IDX'] = pd.to_numeric(df['IDX']).astype('int64')
+    df['RANK'] = pd.to_numeric(df['RANK']).astype('int64')
+    return df
+
+@traced(swr_cache(ttl=3600, show_spinner="Fetching commerce data..."))
+def get_commerce_sketches():
+    """Get mergeable per-month HyperLogLog sketches of distinct orders and customers"""
+    return monthly_rows("commerce_sketches", commerce_sketch_query, prepare_commerce_sketches)
+
+@traced(swr_cache(ttl=3600, show_spinner="Fetching commerce data..."))
+def get_commerce_trends():
+    """Get 24-month commerce trends - only the open months are re-queried in incremental mode.
+    With FANGRAPH_APPROX_DISTINCT=1 orders and customers are HyperLogLog estimates."""
+    if not APPROX_DISTINCT:
+        return monthly_rows("commerce_months", commerce_trends_query, prepare_commerce_trends)
+    revenue = monthly_rows("commerce_revenue_months", commerce_revenue_query, prepare_commerce_revenue)
+    counts = hll.merge_estimates(get_commerce_sketches(), ['MONTH', 'METRIC']).unstack('METRIC')
+    df = revenue.merge(counts.round().astype('int64').reset_index(), on='MONTH', how='left')
+    return df[['MONTH', 'ORDERS', 'CUSTOMERS', 'REVENUE']]
+
+def commerce_windows(now):
+    """Reporting windows as (start, end) month bounds - complete months except the to-date ones"""
+    this_month = now.normalize().replace(day=1)
+    next_month = this_month + pd.DateOffset(months=1)
+    return {
+        "Trailing 12 Months": (this_month - pd.DateOffset(months=12), this_month),
+        "Previous 12 Months": (this_month - pd.DateOffset(months=24), this_month - pd.DateOffset(months=12)),
+        "Year to Date": (this_month.replace(month=1), next_month),
+        "Quarter to Date": (this_month.replace(month=3 * ((this_month.month - 1) // 3) + 1), next_month),
+    }
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_commerce_window_stats():
+    """Get orders, customers and revenue per reporting window by merging monthly sketches"""
+    sketches = get_commerce_sketches()
+    trends = get_commerce_trends()
+    rows = []
+    for window, (start, end) in commerce_windows(pd.Timestamp.now()).items():
+        counts = hll.window_estimate(sketches, start, end)
+        in_window = (trends['MONTH'] >= start) & (trends['MONTH'] < end)
+        rows.append({
+            'WINDOW': window,
+            'START': start,
+            'END': end,
+            'ORDERS': round(counts.get('ORDERS', 0)),
+            'CUSTOMERS': round(counts.get('CUSTOMERS', 0)),
+            'REVENUE': trends.loc[in_window, 'REVENUE'].sum(),
+        })
+    return pd.DataFrame(rows).set_index('WINDOW')
+
+@traced(swr_cache(ttl=3600, show_spinner="Fetching team data..."))
+def get_team_cube():
+    """Get fans per league, team and OpCo mask - one scan flattening every league's team preferences.
+
+    The outer FLATTEN walks ARRAY_CONSTRUCT of the FANGRAPH_PREFERENCE_<league>_TEAMS
+    arrays (its INDEX names the league), the inner one each array's teams.
+    Top-N lists for any league, N or OpCo segment and single-team lookups
+    are sliced from this frame locally (team_counts).
     """
-    df = run_query(query)
-    df['NFL_TEAM'] = df['NFL_TEAM'].str.title()
+    league = "CASE l.index " + " ".join(f"WHEN {i} THEN '{name}'" for i, name in enumerate(LEAGUES)) + " END"
+    teams = ", ".join(f"FANGRAPH_PREFERENCE_{name}_TEAMS" for name in LEAGUES)
+    query = select(
+        "FANGRAPH.ADMIN.FANGRAPH",
+        measures={"FAN_COUNT": "COUNT(*)"},
+        dimensions={"LEAGUE": league, "TEAM_VALUE": "t.value::STRING", "OPCO_MASK": segments.mask_sql()},
+        joins=[f"LATERAL FLATTEN(input => ARRAY_CONSTRUCT({teams})) l", "LATERAL FLATTEN(input => l.value) t"],
+    )
+    df = run_query(*query, summary="team_cube")
+    df['OPCO_MASK'] = pd.to_numeric(df['OPCO_MASK']).astype('uint8')
+    df['FAN_COUNT'] = pd.to_numeric(df['FAN_COUNT'])
     return df
 
-@st.cache_data(ttl=3600, show_spinner="Fetching demographics...")
+def team_counts(league, segment=segments.ALL_FANS, top=None):
+    """Sum the team cube into TEAM / FAN_COUNT / TEAM_VALUE for one league and OpCo segment, largest first"""
+    cube = get_team_cube()
+    cube = cube[cube['LEAGUE'] == league]
+    segment = segments.as_segment(segment)
+    if not segment.is_all:
+        cube = cube[segment.matches(cube['OPCO_MASK'])]
+    df = cube.groupby('TEAM_VALUE', as_index=False)['FAN_COUNT'].sum()
+    df = df.sort_values(['FAN_COUNT', 'TEAM_VALUE'], ascending=[False, True], ignore_index=True)
+    if top is not None:
+        df = df.head(top)
+    df['TEAM'] = df['TEAM_VALUE'].str.title()  # TEAM_VALUE stays as stored, for drilling down
+    return df[['TEAM', 'FAN_COUNT', 'TEAM_VALUE']]
+
+def nfl_team_counts(segment=segments.ALL_FANS, top=None):
+    """NFL_TEAM / FAN_COUNT / TEAM_VALUE for one OpCo segment, largest first"""
+    return team_counts("NFL", segment, top).rename(columns={'TEAM': 'NFL_TEAM'})
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_league_teams():
+    """Get every league's teams with their fan counts - LEAGUE / TEAM / FAN_COUNT, sliced from the team cube"""
+    df = get_team_cube().groupby(['LEAGUE', 'TEAM_VALUE'], as_index=False)['FAN_COUNT'].sum()
+    df['TEAM'] = df['TEAM_VALUE'].str.title()
+    order = df['LEAGUE'].map({name: i for i, name in enumerate(LEAGUES)})
+    df = df.assign(ORDER=order).sort_values(['ORDER', 'FAN_COUNT'], ascending=[True, False], ignore_index=True)
+    return df[['LEAGUE', 'TEAM', 'FAN_COUNT']]
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_nfl_teams(segment="ALL", top=15):
+    """Get the top NFL teams by fan count for an OpCo segment - sliced from the team cube"""
+    return nfl_team_counts(segment, top)
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
 def get_age_demographics():
     """Get age distribution"""
-    query = """
-    SELECT 
-        FANGRAPH_AGE_RANGE as AGE_RANGE,
-        COUNT(*) as FAN_COUNT
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    WHERE FANGRAPH_AGE_RANGE IS NOT NULL
-    GROUP BY FANGRAPH_AGE_RANGE
-    ORDER BY FAN_COUNT DESC
-    """
-    df = run_query(query)
-    return df
+    return age_counts(get_fan_cube())
 
-@st.cache_data(ttl=3600, show_spinner="Fetching league data...")
+@traced(swr_cache(ttl=3600, show_spinner=False))
 def get_league_preferences():
-    """Get league preference breakdown - optimized single scan"""
-    query = """
-    SELECT 
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NFL = TRUE THEN 1 ELSE 0 END) as NFL,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_MLB = TRUE THEN 1 ELSE 0 END) as MLB,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NBA = TRUE THEN 1 ELSE 0 END) as NBA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NCAA = TRUE THEN 1 ELSE 0 END) as NCAA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NHL = TRUE THEN 1 ELSE 0 END) as NHL
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    """
-    result = run_query(query).iloc[0]
-    data = [
-        {'LEAGUE': 'NFL', 'FAN_COUNT': result['NFL']},
-        {'LEAGUE': 'MLB', 'FAN_COUNT': result['MLB']},
-        {'LEAGUE': 'NBA', 'FAN_COUNT': result['NBA']},
-        {'LEAGUE': 'NCAA', 'FAN_COUNT': result['NCAA']},
-        {'LEAGUE': 'NHL', 'FAN_COUNT': result['NHL']},
-    ]
-    df = pd.DataFrame(data)
-    df = df.sort_values('FAN_COUNT', ascending=False)
-    return df
+    """Get league preference breakdown - sliced from the fan cube"""
+    return league_counts(get_fan_cube())
 
-@st.cache_data(ttl=3600, show_spinner="Fetching state data...")
+@traced(swr_cache(ttl=3600, show_spinner=False))
 def get_geo_data():
     """Get top 20 states by fan count"""
-    query = """
-    SELECT 
-        FANGRAPH_STATE as STATE,
-        COUNT(*) as FAN_COUNT
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    WHERE FANGRAPH_STATE IS NOT NULL AND LENGTH(FANGRAPH_STATE) = 2
-    GROUP BY FANGRAPH_STATE
-    ORDER BY FAN_COUNT DESC
-    LIMIT 20
-    """
-    df = run_query(query)
-    return df
+    df = get_fan_cube().groupby('STATE', as_index=False)['FAN_COUNT'].sum()
+    return df.nlargest(20, 'FAN_COUNT').reset_index(drop=True)
 
-@st.cache_data(ttl=3600, show_spinner="Fetching revenue data...")
-def get_revenue_by_year(opco: str = "ALL"):
-    """Get gross revenue by year (2024 and 2025) from transaction-level data by OpCo.
-    For OpCos without transaction tables, uses FANGRAPH lifetime columns."""
-    
-    # OpCo-specific queries using transaction tables
-    opco_queries = {
-        "Commerce": """
-            SELECT YEAR(ORDER_TS) as YEAR, SUM(GROSS_DEMAND) as REVENUE
-            FROM FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE 
-            WHERE YEAR(ORDER_TS) IN (2024, 2025) 
-            GROUP BY YEAR(ORDER_TS)
-        """,
-        "FBG (Sportsbook)": """
-            SELECT YEAR(WAGER_PLACED_TIME_UTC) as YEAR, SUM(TOTAL_STAKE_BY_WAGER) as REVENUE
-            FROM FANGRAPH.FBG.DIM_FBG_PURCHASE 
-            WHERE YEAR(WAGER_PLACED_TIME_UTC) IN (2024, 2025) 
-            GROUP BY YEAR(WAGER_PLACED_TIME_UTC)
-        """,
-        "Events": """
-            SELECT YEAR(ORDER_COMPLETED_TIME) as YEAR, SUM(ORDER_TOTAL_PAID) as REVENUE
-            FROM FANGRAPH.EVENTS.DIM_EVENTS_PURCHASE 
-            WHERE YEAR(ORDER_COMPLETED_TIME) IN (2024, 2025) 
-            GROUP BY YEAR(ORDER_COMPLETED_TIME)
-        """,
-        "Topps.com": """
-            SELECT YEAR(ORDER_TS) as YEAR, SUM(P_GMV_USD) as REVENUE
-            FROM FANGRAPH.TOPPS.DIM_TOPPS_PURCHASE 
-            WHERE YEAR(ORDER_TS) IN (2024, 2025) 
-            GROUP BY YEAR(ORDER_TS)
-        """
-    }
-    
-    # OpCos that use FANGRAPH lifetime columns (no transaction tables)
-    fangraph_revenue_columns = {
-        "Live": "COALESCE(LIVE_TOTAL_REVENUE, 0)",
-        "FanApp": "COALESCE(FANAPP_COMMERCE_ORDER_AMOUNT_TOTAL, 0)",
-        "Topps Digital": """
-            COALESCE(TOPPS_DIGITAL_BASEBALL_SPEND_AMOUNT_LIFETIME, 0)
-            + COALESCE(TOPPS_DIGITAL_DISNEY_SPEND_AMOUNT_LIFETIME, 0)
-            + COALESCE(TOPPS_DIGITAL_MARVEL_SPEND_AMOUNT_LIFETIME, 0)
-            + COALESCE(TOPPS_DIGITAL_STARWARS_SPEND_AMOUNT_LIFETIME, 0)
-            + COALESCE(TOPPS_DIGITAL_WWE_SPEND_AMOUNT_LIFETIME, 0)
-        """,
-        "Collect": "COALESCE(COLLECT_REVENUE_LIFETIME, 0)"
-    }
-    
-    opco_filters = {
-        "Live": "LIVE_FAN_INDICATOR = TRUE",
-        "FanApp": "FANAPP_FAN_INDICATOR = TRUE",
-        "Topps Digital": "TOPPS_DIGITAL_FAN_INDICATOR = TRUE",
-        "Collect": "COLLECT_FAN_INDICATOR = TRUE"
-    }
-    
-    if opco == "ALL":
-        # Combine transaction-level data + FANGRAPH lifetime data for other OpCos
-        query = """
-            SELECT YEAR, SUM(REVENUE) as REVENUE FROM (
-                -- Commerce (transaction-level)
-                SELECT YEAR(ORDER_TS) as YEAR, SUM(GROSS_DEMAND) as REVENUE
-                FROM FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE WHERE YEAR(ORDER_TS) IN (2024, 2025) GROUP BY YEAR(ORDER_TS)
-                UNION ALL
-                -- FBG (transaction-level)
-                SELECT YEAR(WAGER_PLACED_TIME_UTC) as YEAR, SUM(TOTAL_STAKE_BY_WAGER) as REVENUE
-                FROM FANGRAPH.FBG.DIM_FBG_PURCHASE WHERE YEAR(WAGER_PLACED_TIME_UTC) IN (2024, 2025) GROUP BY YEAR(WAGER_PLACED_TIME_UTC)
-                UNION ALL
-                -- Events (transaction-level)
-                SELECT YEAR(ORDER_COMPLETED_TIME) as YEAR, SUM(ORDER_TOTAL_PAID) as REVENUE
-                FROM FANGRAPH.EVENTS.DIM_EVENTS_PURCHASE WHERE YEAR(ORDER_COMPLETED_TIME) IN (2024, 2025) GROUP BY YEAR(ORDER_COMPLETED_TIME)
-                UNION ALL
-                -- Topps.com (transaction-level)
-                SELECT YEAR(ORDER_TS) as YEAR, SUM(P_GMV_USD) as REVENUE
-                FROM FANGRAPH.TOPPS.DIM_TOPPS_PURCHASE WHERE YEAR(ORDER_TS) IN (2024, 2025) GROUP BY YEAR(ORDER_TS)
-                UNION ALL
-                -- Live, FanApp, Topps Digital, Collect (FANGRAPH lifetime - split 50/50 between years)
-                SELECT 2024 as YEAR, SUM(
-                    COALESCE(LIVE_TOTAL_REVENUE, 0)
-                    + COALESCE(FANAPP_COMMERCE_ORDER_AMOUNT_TOTAL, 0)
-                    + COALESCE(TOPPS_DIGITAL_BASEBALL_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_DISNEY_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_MARVEL_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_STARWARS_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_WWE_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(COLLECT_REVENUE_LIFETIME, 0)
-                ) / 2 as REVENUE
-                FROM FANGRAPH.ADMIN.FANGRAPH
-                UNION ALL
-                SELECT 2025 as YEAR, SUM(
-                    COALESCE(LIVE_TOTAL_REVENUE, 0)
-                    + COALESCE(FANAPP_COMMERCE_ORDER_AMOUNT_TOTAL, 0)
-                    + COALESCE(TOPPS_DIGITAL_BASEBALL_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_DISNEY_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_MARVEL_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_STARWARS_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(TOPPS_DIGITAL_WWE_SPEND_AMOUNT_LIFETIME, 0)
-                    + COALESCE(COLLECT_REVENUE_LIFETIME, 0)
-                ) / 2 as REVENUE
-                FROM FANGRAPH.ADMIN.FANGRAPH
-            )
-            GROUP BY YEAR
-            ORDER BY YEAR
-        """
-    elif opco in opco_queries:
-        # Use transaction-level query
-        query = opco_queries[opco]
-    elif opco in fangraph_revenue_columns:
-        # Use FANGRAPH lifetime columns - split 50/50 between years as approximation
-        revenue_col = fangraph_revenue_columns[opco]
-        filter_clause = opco_filters[opco]
-        query = f"""
-            SELECT 2024 as YEAR, SUM({revenue_col}) / 2 as REVENUE
-            FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}
-            UNION ALL
-            SELECT 2025 as YEAR, SUM({revenue_col}) / 2 as REVENUE
-            FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}
-        """
-    else:
-        return {'2024': 0.0, '2025': 0.0}
+# OpCos with transaction tables: (table, timestamp column, gross revenue column)
+REVENUE_TABLES = {
+    "Commerce": ("FANGRAPH.COMMERCE.DIM_COMMERCE_PURCHASE", "ORDER_TS", "GROSS_DEMAND"),
+    "FBG (Sportsbook)": ("FANGRAPH.FBG.DIM_FBG_PURCHASE", "WAGER_PLACED_TIME_UTC", "TOTAL_STAKE_BY_WAGER"),
+    "Events": ("FANGRAPH.EVENTS.DIM_EVENTS_PURCHASE", "ORDER_COMPLETED_TIME", "ORDER_TOTAL_PAID"),
+    "Topps.com": ("FANGRAPH.TOPPS.DIM_TOPPS_PURCHASE", "ORDER_TS", "P_GMV_USD"),
+}
+
+# OpCos without transaction tables: FANGRAPH lifetime revenue columns
+LIFETIME_REVENUE_COLUMNS = {
+    "Live": ["LIVE_TOTAL_REVENUE"],
+    "FanApp": ["FANAPP_COMMERCE_ORDER_AMOUNT_TOTAL"],
+    "Topps Digital": [
+        "TOPPS_DIGITAL_BASEBALL_SPEND_AMOUNT_LIFETIME",
+        "TOPPS_DIGITAL_DISNEY_SPEND_AMOUNT_LIFETIME",
+        "TOPPS_DIGITAL_MARVEL_SPEND_AMOUNT_LIFETIME",
+        "TOPPS_DIGITAL_STARWARS_SPEND_AMOUNT_LIFETIME",
+        "TOPPS_DIGITAL_WWE_SPEND_AMOUNT_LIFETIME",
+    ],
+    "Collect": ["COLLECT_REVENUE_LIFETIME"],
+}
+
+REVENUE_YEARS = (2024, 2025)
+
+@traced(swr_cache(ttl=3600, show_spinner="Fetching revenue data..."))
+def get_revenue_frame():
+    """Get gross revenue for every OpCo and year in one query - OPCO / YEAR / REVENUE.
+
+    Transaction-table OpCos are summed per year with timestamp range
+    predicates (so the purchase tables can prune partitions). The four
+    FANGRAPH lifetime OpCos come from a single FANGRAPH scan, split 50/50
+    between the years as an approximation.
+    """
+    start, end = f"{min(REVENUE_YEARS)}-01-01", f"{max(REVENUE_YEARS) + 1}-01-01"
     
-    result = run_query(query)
+    transaction_parts = [
+        select(
+            table,
+            measures={"REVENUE": f"SUM({revenue_col})"},
+            dimensions={"OPCO": f"'{opco}'", "YEAR": f"YEAR({ts_col})"},
+            filters=[gte(ts_col, start), lt(ts_col, end)],
+        )
+        for opco, (table, ts_col, revenue_col) in REVENUE_TABLES.items()
+    ]
     
-    # Convert to dict by year
-    revenue_by_year = {'2024': 0.0, '2025': 0.0}
-    for _, row in result.iterrows():
-        year = str(int(row['YEAR']))
-        revenue_by_year[year] = float(row['REVENUE']) if row['REVENUE'] is not None else 0.0
+    # One lifetime sum per OpCo (fans flagged for that OpCo only), then fanned out to OpCo x year rows
+    lifetime_sums = ",\n            ".join(
+        f"SUM(CASE WHEN {OPCO_COLUMNS[opco]}_FAN_INDICATOR = TRUE THEN "
+        + " + ".join(f"COALESCE({col}, 0)" for col in cols)
+        + f" ELSE 0 END) as {OPCO_COLUMNS[opco]}"
+        for opco, cols in LIFETIME_REVENUE_COLUMNS.items()
+    )
+    lifetime_pick = " ".join(
+        f"WHEN '{opco}' THEN l.{OPCO_COLUMNS[opco]}" for opco in LIFETIME_REVENUE_COLUMNS
+    )
+    lifetime_opcos = ", ".join(f"('{opco}')" for opco in LIFETIME_REVENUE_COLUMNS)
+    years = ", ".join(f"({year})" for year in REVENUE_YEARS)
+    lifetime_part = f"""SELECT o.OPCO, y.YEAR, (CASE o.OPCO {lifetime_pick} END) / {len(REVENUE_YEARS)} as REVENUE
+        FROM (
+            SELECT
+            {lifetime_sums}
+            FROM FANGRAPH.ADMIN.FANGRAPH
+        ) l
+        CROSS JOIN (VALUES {lifetime_opcos}) as o(OPCO)
+        CROSS JOIN (VALUES {years}) as y(YEAR)"""
     
-    return revenue_by_year
+    query = union_all(transaction_parts + [Query(lifetime_part)])
+    df = run_query(*query, summary="revenue")
+    df['YEAR'] = pd.to_numeric(df['YEAR']).astype(int)
+    df['REVENUE'] = pd.to_numeric(df['REVENUE'], errors='coerce').fillna(0.0).astype(float)
+    return df
+
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_revenue_by_year(segment="ALL"):
+    """Get gross revenue by year (2024 and 2025) of a segment's OpCos, or all OpCos combined.
+    Revenue is per OpCo, so a segment counts its included OpCos (or every OpCo it does
+    not exclude). Sliced from get_revenue_frame()."""
+    df = get_revenue_frame()
+    segment = segments.as_segment(segment)
+    if segment.include:
+        df = df[df['OPCO'].isin(segment.include)]
+    elif segment.exclude:
+        df = df[~df['OPCO'].isin(segment.exclude)]
+    totals = df.groupby('YEAR')['REVENUE'].sum()
+    return {str(year): float(totals.get(year, 0.0)) for year in REVENUE_YEARS}
 
 # ============== OPCO-FILTERED QUERIES ==============
-@st.cache_data(ttl=3600, show_spinner="Fetching filtered data...")
-def get_opco_filtered_stats(opco: str):
-    """Get stats filtered by OpCo"""
-    if opco == "ALL":
-        filter_clause = "1=1"
-    else:
-        opco_filters = {
-            "Commerce": "COMMERCE_FAN_INDICATOR = TRUE",
-            "Topps Digital": "TOPPS_DIGITAL_FAN_INDICATOR = TRUE",
-            "Topps.com": "TOPPS_COM_FAN_INDICATOR = TRUE",
-            "FBG (Sportsbook)": "FBG_FAN_INDICATOR = TRUE",
-            "FanApp": "FANAPP_FAN_INDICATOR = TRUE",
-            "Live": "LIVE_FAN_INDICATOR = TRUE",
-            "Collect": "COLLECT_FAN_INDICATOR = TRUE",
-            "Events": "EVENTS_FAN_INDICATOR = TRUE"
-        }
-        filter_clause = opco_filters.get(opco, "1=1")
-    
-    # Total fans for this OpCo
-    total_query = f"SELECT COUNT(*) as CNT FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}"
-    total = run_query(total_query)['CNT'].iloc[0]
-    
-    # League breakdown for this OpCo - optimized single scan
-    league_query = f"""
-    SELECT 
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NFL = TRUE THEN 1 ELSE 0 END) as NFL,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_MLB = TRUE THEN 1 ELSE 0 END) as MLB,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NBA = TRUE THEN 1 ELSE 0 END) as NBA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NCAA = TRUE THEN 1 ELSE 0 END) as NCAA,
-        SUM(CASE WHEN FANGRAPH_PREFERENCE_NHL = TRUE THEN 1 ELSE 0 END) as NHL
-    FROM FANGRAPH.ADMIN.FANGRAPH WHERE {filter_clause}
-    """
-    result = run_query(league_query).iloc[0]
-    leagues_df = pd.DataFrame([
-        {'LEAGUE': 'NFL', 'FAN_COUNT': result['NFL']},
-        {'LEAGUE': 'MLB', 'FAN_COUNT': result['MLB']},
-        {'LEAGUE': 'NBA', 'FAN_COUNT': result['NBA']},
-        {'LEAGUE': 'NCAA', 'FAN_COUNT': result['NCAA']},
-        {'LEAGUE': 'NHL', 'FAN_COUNT': result['NHL']},
-    ]).sort_values('FAN_COUNT', ascending=False)
-    
-    # Age breakdown for this OpCo
-    age_query = f"""
-    SELECT 
-        FANGRAPH_AGE_RANGE as AGE_RANGE,
-        COUNT(*) as FAN_COUNT
-    FROM FANGRAPH.ADMIN.FANGRAPH
-    WHERE {filter_clause} AND FANGRAPH_AGE_RANGE IS NOT NULL
-    GROUP BY FANGRAPH_AGE_RANGE
-    ORDER BY FAN_COUNT DESC
-    """
-    age_df = run_query(age_query)
-    
+@traced(swr_cache(ttl=3600, show_spinner=False))
+def get_opco_filtered_stats(segment):
+    """Get stats filtered by OpCo segment (or label) - sliced from the fan cube"""
+    cube = slice_fan_cube(segment)
     return {
-        'total': total,
-        'leagues': leagues_df,
-        'age': age_df
+        'total': cube['FAN_COUNT'].sum(),
+        'leagues': league_counts(cube),
+        'age': age_counts(cube)
     }
 
 # ============== HELPER FUNCTIONS ==============
@@ -533,14 +695,1007 @@ def format_number(num, suffix=''):
         return f"{num/1_000:.1f}K{suffix}"
     return f"{num:,.0f}{suffix}"
 
-def clear_cache():
-    """Clear all cached data"""
-    st.cache_data.clear()
-    st.success("Data cache cleared! Refreshing...")
-    st.rerun()
+def segment_picker(key, help):
+    """OpCo include / match / exclude controls returning the chosen segments.Segment"""
+    col1, col2, col3 = st.columns([3, 1, 2])
+    with col1:
+        include = st.multiselect("Operating Companies", list(OPCO_COLUMNS), key=f"{key}_include", placeholder="All OpCos", help=help)
+    with col2:
+        match = st.radio(
+            "Match",
+            ["All", "Any"],
+            key=f"{key}_match",
+            horizontal=True,
+            help="All: fans of every selected OpCo (AND). Any: fans of at least one (OR)."
+        )
+    with col3:
+        exclude = st.multiselect("Excluding", list(OPCO_COLUMNS), key=f"{key}_exclude", placeholder="None")
+    return segments.Segment(
+        tuple(include),
+        tuple(opco for opco in exclude if opco not in include),
+        segments.MATCH_ALL if match == "All" else segments.MATCH_ANY,
+    )
+
+def filter_fragment(*getters):
+    """Decorator rendering a tab section as an st.fragment, rerun alone when its own widgets change.
+
+    ``getters`` are the cached getters the section reads. A fragment-only
+    rerun skips main(), so the section warms them itself and opens its own
+    rerun span; the header, sidebar and other tabs are not rebuilt or resent.
+    """
+    def decorate(render):
+        @st.fragment
+        @functools.wraps(render)
+        def fragment():
+            ctx = get_script_run_ctx()
+            if not (ctx and ctx.fragment_ids_this_run):
+                return render()
+            with span(render.__name__, "rerun", session=ctx.session_id, trigger=rerun_trigger(), fragment=render.__name__):
+                prefetch(list(getters))
+                render()
+            st.session_state['last_widget_values'] = widget_values()
+        return fragment
+    return decorate
+
+def prefetch(getters):
+    """Warm cached getters concurrently so a cold page waits for the slowest query, not the sum"""
+    if len(getters) < 2:
+        return
+    ctx = get_script_run_ctx()
+    # Each task runs in a copy of this context so its spans join the current trace.
+    # Page writes are not thread-safe: workers show no spinner, the main thread shows one for all.
+    with st.spinner("Loading dashboard data..."):
+        run_batch(
+            {i: functools.partial(quiet_context().run, getter) for i, getter in enumerate(getters)},
+            initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+            return_exceptions=True  # the tab's own call surfaces any error
+        )
+
+def session_memo(key, loader, ttl=3600):
+    """Memoize a tab's data in this session so returning to the tab is instant"""
+    memo = st.session_state.setdefault('tab_memo', {})
+    entry = memo.get(key)
+    if entry is None or time.time() - entry[0] > ttl:
+        entry = memo[key] = (time.time(), loader())
+    return entry[1]
+
+def format_age(as_of):
+    """Describe how long ago an epoch timestamp was, e.g. '5 min ago'"""
+    if not as_of:
+        return "Live"
+    seconds = max(time.time() - as_of, 0)
+    if seconds < 60:
+        return "Just now"
+    if seconds < 3600:
+        return f"{seconds // 60:.0f} min ago"
+    if seconds < 86400:
+        return f"{seconds // 3600:.0f} h ago"
+    return f"{seconds // 86400:.0f} days ago"
+
+def refresh_changed_data():
+    """Refresh only the cached results whose source tables changed since their data was read.
+
+    Stale results keep being served while the background worker refills them.
+    """
+    if not SWR_ENABLED:
+        st.cache_data.clear()
+        st.session_state.pop('tab_memo', None)
+        st.rerun()
+    with span("source_check", "source_check") as s:
+        tables = source_tables()
+        invalidation.LAST_ALTERED.update(source_versions(get_connection(), tables))
+        refreshing = invalidate(invalidation.changed_since)
+        s.attributes.update(tables=len(tables), refreshing=refreshing)
+    if refreshing:
+        st.session_state.pop('tab_memo', None)
+        st.success(f"Source data changed - refreshing {refreshing} cached results in the background")
+    else:
+        st.info("Data is up to date")
+
+# ============== EXPORT ==============
+def stream_query(query, params=()):
+    """Yield the result of ``query`` as Arrow batches straight from the warehouse - no caching, no DataFrame"""
+    yield from get_connection().arrow_batches(query, list(params), batch_rows=export.BATCH_ROWS)
+
+def render_export(key, label, batches, total=None):
+    """Export controls for one dataset: ``batches()`` yields its Arrow batches, ``total`` its row count if known.
+
+    Rows are written to disk as they arrive. Clicking Cancel reruns the
+    script, which stops the export at its next progress update and discards
+    the partial file.
+    """
+    state_key = f"export_{key}"
+    with st.expander(f"⬇️ Export {label}"):
+        fmt = st.radio("Format", list(export.FORMATS), horizontal=True, key=f"{state_key}_format")
+        col1, col2 = st.columns(2)
+        start = col1.button("Export", key=f"{state_key}_start")
+        cancelled = col2.button("Cancel", key=f"{state_key}_cancel")
+        if cancelled:
+            st.info("Export cancelled")
+        if start:
+            st.session_state.pop(state_key, None)
+            export.prune()
+            bar = st.progress(0.0, text="Starting export...")
+            
+            def progress(rows):
+                bar.progress(min(rows / total, 1.0) if total else 0.0, text=f"{rows:,} rows written")
+            
+            path = export.export_path(label, fmt)
+            with span("export", "export", dataset=label, format=fmt) as s:
+                rows = export.write_batches(batches(), path, fmt, progress)
+                s.attributes['rows'] = rows
+            bar.empty()
+            st.session_state[state_key] = (str(path), rows, fmt) if rows else None
+            if not rows:
+                st.info("No rows to export")
+        done = st.session_state.get(state_key)
+        if done and os.path.exists(done[0]):
+            path, rows, fmt = done
+            # Deferred: the file is only opened and streamed when the button is clicked
+            st.download_button(
+                f"Download {rows:,} rows ({fmt})",
+                lambda path=path: open(path, "rb"),
+                file_name=os.path.basename(path),
+                mime=export.FORMATS[fmt][1],
+                key=f"{state_key}_download"
+            )
+
+# ============== DRILL-DOWN ==============
+def selected_bar(event, axis):
+    """Category (``x`` or ``y`` value) of the bar picked in a chart's selection event, or None"""
+    points = event["selection"]["points"] if event else []
+    return points[0].get(axis) if points else None
+
+def render_drilldown(key, bar):
+    """Page through the fans behind the selected bar, given as ``(label, filters, fan_count)``.
+
+    The page cursors (the last FANGRAPH_ID of every page read so far) live in
+    session state under ``key`` and start over whenever another bar is picked.
+    """
+    state_key = f"drill_{key}"
+    if bar is None:
+        st.session_state.pop(state_key, None)
+        return
+    label, filters, fan_count = bar
+    state = st.session_state.get(state_key)
+    if state is None or state['label'] != label:
+        state = st.session_state[state_key] = {'label': label, 'cursors': [None]}
+    cursors = state['cursors']
+    page = drilldown.fetch_page(run_query, filters, cursors[-1])
+    
+    first = (len(cursors) - 1) * drilldown.PAGE_SIZE
+    st.markdown(f"#### 🔎 Fans behind {label}")
+    st.caption(f"Fans {first + 1:,}–{first + len(page.rows):,} · bar total {fan_count:,.0f} · ordered by FanGraph ID")
+    st.dataframe(
+        page.rows.rename(columns={col: opco for opco, col in OPCO_COLUMNS.items()}),
+        use_container_width=True,
+        hide_index=True
+    )
+    col1, col2 = st.columns(2)
+    col1.button("← Previous", key=f"{state_key}_prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+    col2.button("Next →", key=f"{state_key}_next", disabled=not page.has_next, on_click=cursors.append, args=(page.next_after,))
+    render_export(state_key, label, lambda: stream_query(*drilldown.export_query(filters)), total=fan_count)
+
+# ============== CHARTS ==============
+# Figures are built by @cached_figure builders from their data arguments, so a
+# rerun with unchanged data reuses the figure. Cached figures are shared:
+# every layout/trace change belongs inside the builder.
+LEAGUE_COLORS = [COLORS['red'], COLORS['blue'], '#FF6B00', COLORS['gold'], '#00D4FF']
+
+@cached_figure
+def fans_gauge(total_fans):
+    fig = go.Figure(go.Indicator(
+        mode="gauge+number",
+        value=total_fans / 1_000_000,
+        title={'text': "Total Fans (Millions)", 'font': {'color': 'white'}},
+        number={'suffix': 'M', 'font': {'color': COLORS['red']}},
+        gauge={
+            'axis': {'range': [0, 250], 'tickcolor': 'white'},
+            'bar': {'color': COLORS['red']},
+            'bgcolor': COLORS['gray'],
+            'bordercolor': '#404040',
+            'steps': [
+                {'range': [0, 75], 'color': '#1a1a1a'},
+                {'range': [75, 150], 'color': '#2d2d2d'},
+                {'range': [150, 250], 'color': '#404040'}
+            ]
+        }
+    ))
+    fig.update_layout(**PLOTLY_LAYOUT, height=300)
+    return fig
+
+@cached_figure
+def league_pie(leagues_df, height, title, hole):
+    fig = px.pie(
+        leagues_df,
+        values='FAN_COUNT',
+        names='LEAGUE',
+        color_discrete_sequence=LEAGUE_COLORS,
+        hole=hole
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=height, title=title)
+    fig.update_traces(textinfo='label+percent', textfont_color='white')
+    return fig
+
+@cached_figure
+def league_bar(leagues_df, height, title):
+    fig = px.bar(
+        leagues_df,
+        x='LEAGUE',
+        y='FAN_COUNT',
+        color='LEAGUE',
+        color_discrete_sequence=LEAGUE_COLORS
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=height, title=title)
+    return fig
+
+@cached_figure
+def count_bar(df, x, height, title, color_scale):
+    """Vertical FAN_COUNT bars per ``x`` value, shaded by count"""
+    fig = px.bar(
+        df,
+        x=x,
+        y='FAN_COUNT',
+        color='FAN_COUNT',
+        color_continuous_scale=color_scale
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=height, title=title)
+    return fig
+
+@cached_figure
+def opco_bar(opco_df):
+    fig = px.bar(
+        opco_df,
+        x='FAN_COUNT',
+        y='OPCO',
+        orientation='h',
+        color='FAN_COUNT',
+        color_continuous_scale=[[0, COLORS['gray']], [0.5, COLORS['red']], [1, COLORS['gold']]]
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=500, title="Fan Distribution by OpCo", showlegend=False)
+    fig.update_traces(texttemplate='%{x:.2s}', textposition='outside')
+    return fig
+
+@cached_figure
+def opco_share_pie(opco_df):
+    fig = px.pie(
+        opco_df,
+        values='FAN_COUNT',
+        names='OPCO',
+        color_discrete_sequence=COLORS['gradient'][1:],
+        hole=0.4
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=400, title="OpCo Market Share (Excluding Commerce)")
+    fig.update_traces(textinfo='label+percent', textfont_color='white')
+    return fig
+
+@cached_figure
+def revenue_trend(commerce_df):
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(
+        x=commerce_df['MONTH'],
+        y=commerce_df['REVENUE'] / 1_000_000,
+        mode='lines+markers',
+        name='Revenue ($M)',
+        line=dict(color=COLORS['red'], width=3),
+        fill='tozeroy',
+        fillcolor='rgba(227,24,55,0.2)'
+    ))
+    fig.update_layout(**PLOTLY_LAYOUT, height=400, title="Monthly Revenue Trend")
+    fig.update_xaxes(title="Month", gridcolor='#404040')
+    fig.update_yaxes(title="Revenue ($ Millions)", gridcolor='#404040')
+    return fig
+
+@cached_figure
+def orders_customers(commerce_df):
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    fig.add_trace(
+        go.Bar(x=commerce_df['MONTH'], y=commerce_df['ORDERS'] / 1_000_000, name='Orders (M)', marker_color=COLORS['blue']),
+        secondary_y=False
+    )
+    fig.add_trace(
+        go.Scatter(x=commerce_df['MONTH'], y=commerce_df['CUSTOMERS'] / 1_000_000, name='Customers (M)', line=dict(color=COLORS['gold'], width=2)),
+        secondary_y=True
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=400, title="Monthly Orders & Customers")
+    fig.update_xaxes(title="Month", gridcolor='#404040')
+    fig.update_yaxes(title="Orders (Millions)", gridcolor='#404040', secondary_y=False)
+    fig.update_yaxes(title="Customers (Millions)", gridcolor='#404040', secondary_y=True)
+    return fig
+
+@cached_figure
+def nfl_bar(nfl_df):
+    colors_list = [COLORS['green'] if i == 0 else (COLORS['red'] if i < 3 else COLORS['blue']) for i in range(len(nfl_df))]
+    fig = px.bar(
+        nfl_df,
+        x='NFL_TEAM',
+        y='FAN_COUNT',
+        color='NFL_TEAM',
+        color_discrete_sequence=colors_list
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=500, title="NFL Teams by Fan Count", showlegend=False)
+    fig.update_xaxes(tickangle=-45)
+    return fig
+
+@cached_figure
+def overlap_heatmap(matrix, text):
+    fig = px.imshow(
+        matrix,
+        text_auto=text,
+        aspect='auto',
+        color_continuous_scale=[[0, COLORS['gray']], [0.5, COLORS['red']], [1, COLORS['gold']]]
+    )
+    fig.update_layout(**PLOTLY_LAYOUT, height=550, title="Pairwise OpCo Overlap")
+    return fig
+
+# ============== TAB 1: OVERVIEW ==============
+def load_overview_data(segment):
+    """Load the Overview KPIs for one OpCo segment"""
+    if segment.is_all:
+        opco_df = get_opco_breakdown()
+        total_fans = opco_df[opco_df['OPCO'] == 'Total Fans']['FAN_COUNT'].values[0]
+        commerce_fans = opco_df[opco_df['OPCO'] == 'Commerce']['FAN_COUNT'].values[0]
+        leagues_df = get_league_preferences()
+    else:
+        filtered_data = get_opco_filtered_stats(segment)
+        total_fans = filtered_data['total']
+        commerce_fans = total_fans  # Same as total when filtered
+        leagues_df = filtered_data['leagues']
+    return {
+        'total_fans': total_fans,
+        'commerce_fans': commerce_fans,
+        'leagues': leagues_df,
+        'revenue_by_year': get_revenue_by_year(segment)
+    }
+
+@filter_fragment(get_fan_cube, get_revenue_frame)
+def render_overview_segment():
+    """Overview KPIs and charts for the OpCo segment picked above them"""
+    # OpCo Filter
+    segment = segment_picker("overview_opco", "Filter all metrics by any combination of OpCos")
+    
+    # Get data based on filter
+    data = session_memo(('overview', segment), lambda: load_overview_data(segment))
+    total_fans = data['total_fans']
+    commerce_fans = data['commerce_fans']
+    leagues_df = data['leagues']
+    revenue_by_year = data['revenue_by_year']
+    
+    nfl_fans = leagues_df[leagues_df['LEAGUE'] == 'NFL']['FAN_COUNT'].values[0] if len(leagues_df) > 0 else 0
+    
+    # KPI Cards - 5 columns for 2 revenue metrics
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("Total Fans", format_number(total_fans), delta=f"{'Filtered: ' + segment.label() if not segment.is_all else 'All OpCos'}")
+    with col2:
+        if segment.is_all:
+            st.metric("Commerce Fans", format_number(commerce_fans), delta=f"{commerce_fans/total_fans*100:.1f}% of total")
+        else:
+            st.metric("Selected Segment Fans", format_number(total_fans))
+    with col3:
+        st.metric("NFL Preference Fans", format_number(nfl_fans), delta="Top League")
+    with col4:
+        revenue_label = "All OpCos" if not segment.include else ", ".join(segment.include)
+        st.metric("2025 Gross Revenue", format_number(revenue_by_year['2025'], '$'), delta=revenue_label)
+    with col5:
+        st.metric("2024 Gross Revenue", format_number(revenue_by_year['2024'], '$'), delta=revenue_label)
+    
+    st.divider()
+    
+    # Overview Charts
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Gauge chart for total fans
+        fig = fans_gauge(total_fans)
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        # League distribution pie
+        fig = league_pie(leagues_df, height=300, title="League Preferences", hole=0.4)
+        st.plotly_chart(fig, use_container_width=True)
+    render_export("overview", f"{segment.label()} league preferences", lambda: export.frame_batches(leagues_df))
+
+def render_overview_tab():
+    """Executive Overview tab - KPIs, gauge and league mix for the selected OpCo"""
+    st.markdown("### Executive Overview")
+    st.markdown("High-level insights from the FanGraph Agent across 5 key analytical dimensions")
+    
+    render_overview_segment()
+    
+    # Insights
+    st.markdown("### Key Insights")
+    col1, col2, col3, col4 = st.columns(4)
+    
+    with col1:
+        st.markdown("""
+        <div class="insight-card">
+            <div class="insight-title">🎯 Commerce Dominance</div>
+            <div class="insight-text">Commerce fans represent 91.8% of the total fan base, indicating strong e-commerce engagement.</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col2:
+        st.markdown("""
+        <div class="insight-card">
+            <div class="insight-title">🏈 NFL Leads</div>
+            <div class="insight-text">NFL is the most preferred league, 53% more fans than MLB.</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col3:
+        st.markdown("""
+        <div class="insight-card">
+            <div class="insight-title">📅 Seasonal Peaks</div>
+            <div class="insight-text">Nov-Dec shows 2-3x revenue vs other months.</div>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    with col4:
+        st.markdown("""
+        <div class="insight-card">
+            <div class="insight-title">🌎 Geographic Focus</div>
+            <div class="insight-text">CA, TX, FL account for 25% of US fans.</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+
+# ============== TAB 2: OPCO BREAKDOWN ==============
+@filter_fragment(get_fan_cube)
+def render_opco_segment():
+    """OpCo breakdown, or the deep dive of the OpCo segment picked above it"""
+    # OpCo Filter for this tab
+    segment = segment_picker("opco_tab_filter", "Select OpCos to see a detailed breakdown")
+    
+    opco_df = session_memo('opco', get_opco_breakdown)
+    opco_df_no_total = opco_df[opco_df['OPCO'] != 'Total Fans']
+    
+    if segment.is_all:
+        # Show all OpCos
+        # KPI Cards
+        col1, col2, col3, col4 = st.columns(4)
+        
+        top_opcos = opco_df_no_total.head(4)
+        for i, (col, row) in enumerate(zip([col1, col2, col3, col4], top_opcos.itertuples())):
+            with col:
+                st.metric(row.OPCO, format_number(row.FAN_COUNT))
+        
+        # Bar chart
+        fig = opco_bar(opco_df_no_total)
+        event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points", key="opco_chart")
+        st.caption("Click a bar to list the fans behind it")
+        opco = selected_bar(event, 'y')
+        render_drilldown("opco", None if opco is None else (
+            f"{opco} fans",
+            drilldown.bar_filters(opco),
+            opco_df_no_total.set_index('OPCO')['FAN_COUNT'].get(opco, 0),
+        ))
+        
+        # Pie chart (excluding Commerce for better visibility)
+        fig2 = opco_share_pie(opco_df_no_total[opco_df_no_total['OPCO'] != 'Commerce'])
+        st.plotly_chart(fig2, use_container_width=True)
+        render_export("opco", "OpCo breakdown", lambda: export.frame_batches(opco_df))
+    else:
+        # Show filtered OpCo details
+        filtered_data = session_memo(('opco', segment), lambda: get_opco_filtered_stats(segment))
+        
+        st.markdown(f"### {segment.label()} Deep Dive")
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Total Fans", format_number(filtered_data['total']))
+        with col2:
+            pct_of_total = filtered_data['total'] / opco_df[opco_df['OPCO'] == 'Total Fans']['FAN_COUNT'].values[0] * 100
+            st.metric("% of Total FanGraph", f"{pct_of_total:.1f}%")
+        with col3:
+            top_league = filtered_data['leagues'].iloc[0]['LEAGUE'] if len(filtered_data['leagues']) > 0 else "N/A"
+            st.metric("Top League", top_league)
+        
+        # League breakdown for this OpCo
+        age_event = None
+        col1, col2 = st.columns(2)
+        with col1:
+            fig = league_bar(filtered_data['leagues'], height=400, title=f"League Preferences - {segment.label()}")
+            st.plotly_chart(fig, use_container_width=True)
+        
+        with col2:
+            if len(filtered_data['age']) > 0:
+                fig = count_bar(
+                    filtered_data['age'], 'AGE_RANGE', height=400, title=f"Age Distribution - {segment.label()}",
+                    color_scale=[[0, COLORS['gray']], [1, COLORS['red']]]
+                )
+                age_event = st.plotly_chart(
+                    fig, use_container_width=True, on_select="rerun", selection_mode="points", key="opco_age_chart"
+                )
+                st.caption("Click a bar to list the fans behind it")
+        
+        age = selected_bar(age_event, 'x')
+        render_drilldown("opco_age", None if age is None else (
+            f"{segment.label()} fans aged {age}",
+            drilldown.bar_filters(segment, age_range=age),
+            filtered_data['age'].set_index('AGE_RANGE')['FAN_COUNT'].get(age, 0),
+        ))
+        render_export(
+            "opco_filtered",
+            f"{segment.label()} age distribution",
+            lambda: export.frame_batches(filtered_data['age'])
+        )
+
+def render_opco_tab():
+    """OpCo Breakdown tab - fan distribution across business units"""
+    st.markdown("### Fan Count by Operating Company")
+    st.markdown("Distribution of fans across Fanatics business units")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"What is total number of fans in fangraph, and what's the breakdown by each OpCo?"</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    render_opco_segment()
+
+
+# ============== TAB 3: COMMERCE TRENDS ==============
+def render_commerce_tab():
+    """Commerce Trends tab - 24-month revenue, orders and customers"""
+    st.markdown("### Commerce Transaction Trends")
+    st.markdown("24-month analysis of orders, revenue, and customer activity")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"Commerce transactions over the last 12 months compared to previous 12 months, showing product trends and sales changes"</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    commerce_df = session_memo('commerce', get_commerce_trends).copy()
+    
+    # KPIs
+    # Convert numeric columns to float (Snowflake returns Decimal)
+    commerce_df['REVENUE'] = pd.to_numeric(commerce_df['REVENUE'], errors='coerce')
+    commerce_df['ORDERS'] = pd.to_numeric(commerce_df['ORDERS'], errors='coerce')
+    commerce_df['CUSTOMERS'] = pd.to_numeric(commerce_df['CUSTOMERS'], errors='coerce')
+    
+    total_revenue = commerce_df['REVENUE'].sum()
+    total_orders = commerce_df['ORDERS'].sum()
+    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+    peak_month = commerce_df.loc[commerce_df['REVENUE'].idxmax(), 'MONTH'].strftime('%b %Y') if len(commerce_df) > 0 else "N/A"
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Total Revenue", format_number(total_revenue, '$'))
+    with col2:
+        st.metric("Total Orders", format_number(total_orders))
+    with col3:
+        st.metric("Avg Order Value", f"${avg_order_value:.2f}")
+    with col4:
+        st.metric("Peak Month", peak_month)
+    
+    # Windows merged from the monthly HyperLogLog sketches
+    if APPROX_DISTINCT:
+        windows = session_memo('commerce_windows', get_commerce_window_stats)
+        current, previous = windows.loc["Trailing 12 Months"], windows.loc["Previous 12 Months"]
+        st.markdown("#### Trailing 12 Months vs Previous 12 Months")
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Customers (T12M)", format_number(current['CUSTOMERS']),
+                      f"{(current['CUSTOMERS'] / previous['CUSTOMERS'] - 1) * 100:+.1f}%" if previous['CUSTOMERS'] else None)
+        with col2:
+            st.metric("Orders (T12M)", format_number(current['ORDERS']),
+                      f"{(current['ORDERS'] / previous['ORDERS'] - 1) * 100:+.1f}%" if previous['ORDERS'] else None)
+        with col3:
+            st.metric("Customers (YTD)", format_number(windows.loc["Year to Date", 'CUSTOMERS']))
+        with col4:
+            st.metric("Customers (QTD)", format_number(windows.loc["Quarter to Date", 'CUSTOMERS']))
+        st.caption(f"Distinct orders and customers are HyperLogLog estimates (±{hll.error_bound() * 100:.1f}% standard error)")
+    
+    # Revenue trend
+    fig = revenue_trend(commerce_df)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Orders and Customers
+    fig2 = orders_customers(commerce_df)
+    st.plotly_chart(fig2, use_container_width=True)
+    render_export("commerce", "commerce trends", lambda: export.frame_batches(commerce_df))
+
+
+# ============== TAB 4: NFL TEAMS ==============
+@filter_fragment(get_team_cube, get_fan_cube)
+def render_nfl_segment():
+    """NFL team ranking, lookup and drill-down for the OpCo segment picked above them"""
+    segment = segment_picker("nfl_opco", "Count only the fans of these OpCos")
+    all_teams = session_memo(('nfl', segment), lambda: nfl_team_counts(segment))
+    if all_teams.empty:
+        st.info(f"No NFL team preferences among {segment.label()} fans")
+        return
+    total_nfl_fans = league_counts(slice_fan_cube(segment)).set_index('LEAGUE')['FAN_COUNT']['NFL']
+    
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        if len(all_teams) > 5:
+            top = st.slider("Teams shown", 5, len(all_teams), min(15, len(all_teams)), key="nfl_top")
+        else:
+            top = len(all_teams)
+    with col2:
+        lookup = st.selectbox("Look up a team", all_teams['NFL_TEAM'], index=None, placeholder="Any team", key="nfl_lookup")
+    nfl_df = all_teams.head(top).copy()
+    
+    # KPIs
+    cols = st.columns(4)
+    for rank, (col, row) in enumerate(zip(cols, nfl_df.itertuples()), 1):
+        with col:
+            st.metric(f"#{rank} {row.NFL_TEAM}", format_number(row.FAN_COUNT))
+    if lookup is not None:
+        rank = all_teams.index[all_teams['NFL_TEAM'] == lookup][0]
+        fans = all_teams['FAN_COUNT'].iloc[rank]
+        st.metric(
+            f"{lookup} - #{rank + 1} of {len(all_teams)}",
+            format_number(fans),
+            delta=f"{fans / total_nfl_fans * 100:.1f}% of {segment.label()} NFL fans",
+            delta_color="off",
+        )
+    
+    # Bar chart
+    fig = nfl_bar(nfl_df)
+    event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points", key="nfl_chart")
+    st.caption("Click a bar to list the fans behind it")
+    picked = selected_bar(event, 'x')
+    team = nfl_df[nfl_df['NFL_TEAM'] == picked]
+    render_drilldown("nfl", None if team.empty else (
+        f"{picked} fans" if segment.is_all else f"{segment.label()} fans of the {picked}",
+        drilldown.bar_filters(segment, nfl_team=team['TEAM_VALUE'].iloc[0]),
+        team['FAN_COUNT'].iloc[0],
+    ))
+    
+    # Data table
+    st.markdown(f"### Top {top} NFL Teams")
+    nfl_df['% of NFL Fans'] = (nfl_df['FAN_COUNT'] / total_nfl_fans * 100).round(1).astype(str) + '%'
+    nfl_df['Fan Count'] = nfl_df['FAN_COUNT'].apply(lambda x: format_number(x))
+    st.dataframe(
+        nfl_df[['NFL_TEAM', 'Fan Count', '% of NFL Fans']].rename(columns={'NFL_TEAM': 'Team'}),
+        use_container_width=True,
+        hide_index=True
+    )
+    render_export("nfl", f"{segment.label()} NFL teams", lambda: export.frame_batches(all_teams[['NFL_TEAM', 'FAN_COUNT']]))
+
+def render_nfl_tab():
+    """NFL Teams tab - team ranking by fan preference, per OpCo segment"""
+    st.markdown("### NFL Team Fan Distribution")
+    st.markdown("NFL teams by fan preference count, for all fans or any combination of OpCos")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"What's the trend of NFL fans purchasing jerseys over the last 4 years? Show top teams by fan count."</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    render_nfl_segment()
+
+# ============== TAB 5: DEMOGRAPHICS ==============
+def render_demographics_tab():
+    """Demographics tab - age and state distribution"""
+    st.markdown("### Fan Demographics")
+    st.markdown("Age distribution and geographic analysis of the fan base")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"Tell me about the demographic profile of fans - their age, location, and other characteristics"</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    age_df = session_memo('age', get_age_demographics)
+    geo_df = session_memo('geo', get_geo_data)
+    
+    # KPIs
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Largest Age Group", age_df.iloc[0]['AGE_RANGE'], delta=format_number(age_df.iloc[0]['FAN_COUNT']))
+    with col2:
+        st.metric("Top State", geo_df.iloc[0]['STATE'], delta=format_number(geo_df.iloc[0]['FAN_COUNT']))
+    with col3:
+        total_with_age = age_df['FAN_COUNT'].sum()
+        st.metric("Fans with Age Data", format_number(total_with_age))
+    with col4:
+        top3_states = geo_df.head(3)['FAN_COUNT'].sum()
+        total_fans = session_memo('total', get_total_fans)
+        st.metric("Top 3 States Share", f"{top3_states/total_fans*100:.0f}%")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Age chart
+        fig = count_bar(
+            age_df, 'AGE_RANGE', height=400, title="Age Distribution",
+            color_scale=[[0, COLORS['gray']], [1, COLORS['red']]]
+        )
+        age_event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points", key="age_chart")
+    
+    with col2:
+        # Geo chart
+        fig = count_bar(
+            geo_df, 'STATE', height=400, title="Top 20 States by Fan Count",
+            color_scale=[[0, '#404040'], [0.5, COLORS['red']], [1, COLORS['gold']]]
+        )
+        state_event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points", key="state_chart")
+    
+    st.caption("Click a bar to list the fans behind it")
+    age = selected_bar(age_event, 'x')
+    render_drilldown("age", None if age is None else (
+        f"fans aged {age}",
+        drilldown.bar_filters(age_range=age),
+        age_df.set_index('AGE_RANGE')['FAN_COUNT'].get(age, 0),
+    ))
+    state = selected_bar(state_event, 'x')
+    render_drilldown("state", None if state is None else (
+        f"fans in {state}",
+        drilldown.bar_filters(state=state),
+        geo_df.set_index('STATE')['FAN_COUNT'].get(state, 0),
+    ))
+    render_export("age", "age distribution", lambda: export.frame_batches(age_df))
+    render_export("geo", "top states", lambda: export.frame_batches(geo_df))
+
+
+# ============== TAB 6: LEAGUE PREFERENCES ==============
+def render_leagues_tab():
+    """League Preferences tab - fan counts per league"""
+    st.markdown("### League Preference Analysis")
+    st.markdown("Fan distribution across major sports leagues")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"Yearly breakdown of fans by league preference for NBA, NFL, MLB, NHL and NCAA"</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    leagues_df = session_memo('leagues', get_league_preferences)
+    
+    # KPIs
+    col1, col2, col3, col4 = st.columns(4)
+    for i, col in enumerate([col1, col2, col3, col4]):
+        if i < len(leagues_df):
+            with col:
+                st.metric(
+                    f"#{i+1} {leagues_df.iloc[i]['LEAGUE']}", 
+                    format_number(leagues_df.iloc[i]['FAN_COUNT'])
+                )
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # Bar chart
+        fig = league_bar(leagues_df, height=450, title="League Fan Distribution")
+        st.plotly_chart(fig, use_container_width=True)
+    
+    with col2:
+        # Pie chart
+        fig = league_pie(leagues_df, height=450, title="League Comparison", hole=0.35)
+        st.plotly_chart(fig, use_container_width=True)
+    
+    render_export("leagues", "league preferences", lambda: export.frame_batches(leagues_df))
+    
+    # Teams within one league
+    st.markdown("### Teams by League")
+    league = st.radio("League", leagues_df['LEAGUE'], horizontal=True, key="league_teams")
+    teams_df = session_memo(('league_teams', league), lambda: team_counts(league, top=15))
+    if teams_df.empty:
+        st.info(f"No {league} team preferences recorded")
+        return
+    fig = count_bar(
+        teams_df, 'TEAM', height=450, title=f"Top {len(teams_df)} {league} Teams by Fan Count",
+        color_scale=[[0, COLORS['gray']], [0.5, COLORS['red']], [1, COLORS['gold']]]
+    )
+    event = st.plotly_chart(fig, use_container_width=True, on_select="rerun", selection_mode="points", key="league_team_chart")
+    st.caption("Click a bar to list the fans behind it")
+    picked = selected_bar(event, 'x')
+    team = teams_df[teams_df['TEAM'] == picked]
+    render_drilldown("league_team", None if team.empty else (
+        f"{picked} fans",
+        drilldown.team_filters(league, team['TEAM_VALUE'].iloc[0]),
+        team['FAN_COUNT'].iloc[0],
+    ))
+    render_export("league_teams", "league teams", lambda: export.frame_batches(get_league_teams()))
+
+# ============== TAB 7: OPCO OVERLAP ==============
+# Exact OpCo combinations shown in the UpSet chart
+UPSET_TOP = 15
+
+def overlap_pairs(overlap):
+    """Every OpCo pair with its shared fans and each side's share, largest first"""
+    first, second = np.triu_indices(len(overlap), k=1)
+    shared = overlap.to_numpy()[first, second]
+    totals = np.diag(overlap.to_numpy())
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'OpCo A': overlap.index[first],
+            'OpCo B': overlap.index[second],
+            'Fans in Both': shared,
+            '% of A': np.round(shared / totals[first] * 100, 1),
+            '% of B': np.round(shared / totals[second] * 100, 1),
+        }).sort_values('Fans in Both', ascending=False, ignore_index=True)
+
+@cached_figure
+def upset_figure(combos):
+    """UpSet chart: fan count bars over a dot matrix marking the OpCos in each exact combination"""
+    opcos = list(OPCO_COLUMNS)
+    positions = list(range(len(combos)))
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.6, 0.4], vertical_spacing=0.03)
+    fig.add_trace(go.Bar(
+        x=positions,
+        y=combos['FAN_COUNT'],
+        marker_color=COLORS['red'],
+        text=[format_number(count) for count in combos['FAN_COUNT']],
+        textposition='outside',
+        hovertext=[" & ".join(members) for members in combos['OPCOS']],
+        hoverinfo='text+y',
+    ), row=1, col=1)
+    # Every cell in gray, then the members of each combination joined by a line
+    fig.add_trace(go.Scatter(
+        x=[x for x in positions for _ in opcos],
+        y=[opco for _ in positions for opco in opcos],
+        mode='markers',
+        marker=dict(color='#404040', size=10),
+        hoverinfo='skip',
+    ), row=2, col=1)
+    xs, ys = [], []
+    for x, members in zip(positions, combos['OPCOS']):
+        xs += [x] * len(members) + [None]
+        ys += list(members) + [None]
+    fig.add_trace(go.Scatter(
+        x=xs,
+        y=ys,
+        mode='lines+markers',
+        line=dict(color=COLORS['gold'], width=2),
+        marker=dict(color=COLORS['gold'], size=12),
+        hoverinfo='skip',
+    ), row=2, col=1)
+    fig.update_layout(**PLOTLY_LAYOUT, height=600, title=f"Top {len(combos)} Exact OpCo Combinations", showlegend=False)
+    fig.update_xaxes(showticklabels=False, showgrid=False)
+    fig.update_yaxes(categoryorder='array', categoryarray=opcos[::-1], row=2, col=1)
+    return fig
+
+def render_overlap_tab():
+    """OpCo Overlap tab - pairwise cross-sell heatmap and UpSet view of exact OpCo combinations"""
+    st.markdown("### OpCo Overlap")
+    st.markdown("How fans cross over between Fanatics business units")
+    
+    st.markdown("""
+    <div class="prompt-box">
+        <div class="prompt-label">FanGraph Agent Prompt</div>
+        <div class="prompt-text">"How many Commerce fans also bet with FBG? Show the overlap between every pair of OpCos."</div>
+    </div>
+    """, unsafe_allow_html=True)
+    
+    overlap = session_memo('overlap', get_opco_overlap)
+    combos = session_memo('intersections', get_opco_intersections)
+    pairs = overlap_pairs(overlap)
+    
+    # KPIs
+    commerce_fbg = overlap.loc['Commerce', 'FBG (Sportsbook)']
+    fbg_fans = overlap.loc['FBG (Sportsbook)', 'FBG (Sportsbook)']
+    multi_opco = combos.loc[combos['DEGREE'] >= 2, 'FAN_COUNT'].sum()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Commerce + FBG Fans", format_number(commerce_fbg))
+    with col2:
+        st.metric("FBG Fans Also in Commerce", f"{commerce_fbg / fbg_fans * 100:.1f}%" if fbg_fans else "N/A")
+    with col3:
+        st.metric("Fans in 2+ OpCos", format_number(multi_opco), delta=f"{multi_opco / combos['FAN_COUNT'].sum() * 100:.1f}% of OpCo fans")
+    with col4:
+        top_pair = pairs.iloc[0]
+        st.metric("Largest Overlap", f"{top_pair['OpCo A']} + {top_pair['OpCo B']}", delta=format_number(top_pair['Fans in Both']))
+    
+    # Pairwise heatmap
+    view = st.radio("Heatmap values", ["Fans in both", "% of row OpCo"], horizontal=True, key="overlap_view")
+    if view == "Fans in both":
+        matrix, text = overlap, '.2s'
+    else:
+        matrix, text = overlap.div(np.diag(overlap).astype(float), axis=0).mul(100).round(1), '.1f'
+    fig = overlap_heatmap(matrix, text)
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # UpSet view of exact combinations
+    st.plotly_chart(upset_figure(combos.head(UPSET_TOP)), use_container_width=True)
+    
+    st.markdown("### OpCo Pairs")
+    st.dataframe(pairs, use_container_width=True, hide_index=True)
+    render_export("overlap", "OpCo overlap pairs", lambda: export.frame_batches(pairs))
+    render_export(
+        "intersections",
+        "OpCo combinations",
+        lambda: export.frame_batches(combos.assign(OPCOS=combos['OPCOS'].str.join(" & ")))
+    )
+
+TABS = {
+    "📊 Overview": render_overview_tab,
+    "🏢 OpCo Breakdown": render_opco_tab,
+    "💰 Commerce Trends": render_commerce_tab,
+    "🏈 NFL Teams": render_nfl_tab,
+    "👥 Demographics": render_demographics_tab,
+    "🏆 League Preferences": render_leagues_tab,
+    "🔀 OpCo Overlap": render_overlap_tab,
+}
+
+# Warehouse queries each tab needs beyond the fan cube (prefetched together)
+TAB_QUERIES = {
+    "📊 Overview": [get_revenue_frame],
+    "💰 Commerce Trends": [get_commerce_trends] + ([get_commerce_sketches] if APPROX_DISTINCT else []),
+    "🏈 NFL Teams": [get_team_cube],
+    "🏆 League Preferences": [get_team_cube],
+}
+
+# Getters whose warehouse results build_summaries.py materializes
+SUMMARY_GETTERS = (get_fan_cube, get_commerce_trends, get_team_cube, get_revenue_frame)
+
+# Widgets whose changes are reported as the trigger of a rerun
+WATCHED_WIDGETS = (
+    "active_tab",
+    *(f"{picker}_{part}" for picker in ("overview_opco", "opco_tab_filter", "nfl_opco") for part in ("include", "match", "exclude")),
+)
+
+# ============== DEBUG PANEL ==============
+def widget_values():
+    return {key: st.session_state.get(key) for key in WATCHED_WIDGETS}
+
+def rerun_trigger():
+    """Name the widget(s) whose value changed since the end of this session's previous rerun"""
+    previous = st.session_state.get('last_widget_values')
+    if previous is None:
+        return "initial load"
+    current = widget_values()
+    changed = [key for key in WATCHED_WIDGETS if current[key] != previous.get(key)]
+    return ", ".join(changed) or "rerun"
+
+def render_debug_panel(rerun):
+    """Sidebar panel listing the getters and queries this rerun ran, with timings"""
+    spans = [s for s in trace_spans(rerun.trace_id) if s.kind in ("getter", "summary", "result_cache", "query")]
+    queries = [s for s in spans if s.kind == "query"]
+    getters = [s for s in spans if s.kind == "getter"]
+    hits = sum(s.attributes.get('cache') == "hit" for s in getters)
+    
+    with st.sidebar.expander("⏱️ Query Timings", expanded=True):
+        flight = QUERY_FLIGHT.stats()
+        figures = figure_cache.stats()
+        st.caption(
+            f"Trigger: {rerun.attributes['trigger']} · {(time.time() - rerun.start) * 1000:.0f} ms so far · "
+            f"process: {flight['executed']} queries run, {flight['coalesced']} coalesced · "
+            f"figures: {figures['hits']} reused, {figures['misses']} built"
+        )
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Queries", len(queries))
+        col2.metric("Query Time", f"{sum(s.duration_s for s in queries):.2f}s")
+        col3.metric("Cache Hits", f"{hits}/{len(getters)}")
+        if spans:
+            st.dataframe(pd.DataFrame([{
+                'Kind': s.kind,
+                'Name': s.attributes.get('fingerprint', s.attributes.get('summary', s.name)),
+                'Tab': s.attributes.get('tab', ''),
+                'Cache': s.attributes.get('cache', ''),
+                'ms': round(s.duration_s * 1000, 1),
+                'Rows': s.attributes.get('rows'),
+                'KB': round(s.attributes['bytes'] / 1024, 1) if 'bytes' in s.attributes else None,
+                'Query ID': s.attributes.get('query_id') or '',
+            } for s in spans]), hide_index=True, use_container_width=True)
 
 # ============== MAIN APP ==============
 def main():
+    ctx = get_script_run_ctx()
+    with span("rerun", "rerun", session=ctx.session_id if ctx else None, trigger=rerun_trigger()) as rerun:
+        render_page()
+        st.session_state['last_widget_values'] = widget_values()
+        if DEBUG_PANEL or st.query_params.get("debug") == "1":
+            render_debug_panel(rerun)
+
+def render_page():
+    # Fan out the cold-cache queries for the header and the tab(s) being built
+    tab_labels = list(TABS)
+    tabs_to_build = [st.session_state.get('active_tab', tab_labels[0])] if LAZY_TABS else tab_labels
+    with span("prefetch", "prefetch"):
+        prefetch([get_fan_cube] + [query for tab in tabs_to_build for query in TAB_QUERIES.get(tab, [])])
+    
     # Load initial data for header stats
     try:
         total_fans_count = get_total_fans()
@@ -640,468 +1795,26 @@ def main():
         st.markdown("### FanGraph Insights")
         st.markdown("---")
         if st.button("🔄 Refresh Data", type="primary", use_container_width=True):
-            clear_cache()
+            refresh_changed_data()
         st.markdown("---")
         st.markdown("**Data Source:** Snowflake")
-        st.markdown("**Last Refresh:** Live")
-    
-    # OpCo filter dropdown (shown on Overview and OpCo tabs)
-    opco_options = ["ALL", "Commerce", "Topps Digital", "Topps.com", "FBG (Sportsbook)", "FanApp", "Live", "Collect", "Events"]
-    
-    # Create tabs
-    tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
-        "📊 Overview", 
-        "🏢 OpCo Breakdown", 
-        "💰 Commerce Trends", 
-        "🏈 NFL Teams", 
-        "👥 Demographics", 
-        "🏆 League Preferences"
-    ])
-    
-    # ============== TAB 1: OVERVIEW ==============
-    with tab1:
-        st.markdown("### Executive Overview")
-        st.markdown("High-level insights from the FanGraph Agent across 5 key analytical dimensions")
-        
-        # OpCo Filter
-        selected_opco = st.selectbox(
-            "Filter by Operating Company",
-            opco_options,
-            key="overview_opco",
-            help="Filter all metrics by a specific OpCo"
-        )
-        
-        # Get data based on filter
-        if selected_opco == "ALL":
-            opco_df = get_opco_breakdown()
-            total_fans = opco_df[opco_df['OPCO'] == 'Total Fans']['FAN_COUNT'].values[0]
-            commerce_fans = opco_df[opco_df['OPCO'] == 'Commerce']['FAN_COUNT'].values[0]
-            leagues_df = get_league_preferences()
-            commerce_df = get_commerce_trends()
-        else:
-            filtered_data = get_opco_filtered_stats(selected_opco)
-            total_fans = filtered_data['total']
-            commerce_fans = total_fans  # Same as total when filtered
-            leagues_df = filtered_data['leagues']
-            commerce_df = get_commerce_trends()  # Commerce data doesn't filter by OpCo
-        
-        nfl_fans = leagues_df[leagues_df['LEAGUE'] == 'NFL']['FAN_COUNT'].values[0] if len(leagues_df) > 0 else 0
-        revenue_by_year = get_revenue_by_year(selected_opco)
-        
-        # KPI Cards - 5 columns for 2 revenue metrics
-        col1, col2, col3, col4, col5 = st.columns(5)
-        with col1:
-            st.metric("Total Fans", format_number(total_fans), delta=f"{'Filtered: ' + selected_opco if selected_opco != 'ALL' else 'All OpCos'}")
-        with col2:
-            if selected_opco == "ALL":
-                st.metric("Commerce Fans", format_number(commerce_fans), delta=f"{commerce_fans/total_fans*100:.1f}% of total")
-            else:
-                st.metric("Selected OpCo Fans", format_number(total_fans))
-        with col3:
-            st.metric("NFL Preference Fans", format_number(nfl_fans), delta="Top League")
-        with col4:
-            revenue_label = "All OpCos" if selected_opco == "ALL" else selected_opco
-            st.metric("2025 Gross Revenue", format_number(revenue_by_year['2025'], '$'), delta=revenue_label)
-        with col5:
-            st.metric("2024 Gross Revenue", format_number(revenue_by_year['2024'], '$'), delta=revenue_label)
-        
-        st.divider()
-        
-        # Overview Charts
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Gauge chart for total fans
-            fig = go.Figure(go.Indicator(
-                mode="gauge+number",
-                value=total_fans / 1_000_000,
-                title={'text': "Total Fans (Millions)", 'font': {'color': 'white'}},
-                number={'suffix': 'M', 'font': {'color': COLORS['red']}},
-                gauge={
-                    'axis': {'range': [0, 250], 'tickcolor': 'white'},
-                    'bar': {'color': COLORS['red']},
-                    'bgcolor': COLORS['gray'],
-                    'bordercolor': '#404040',
-                    'steps': [
-                        {'range': [0, 75], 'color': '#1a1a1a'},
-                        {'range': [75, 150], 'color': '#2d2d2d'},
-                        {'range': [150, 250], 'color': '#404040'}
-                    ]
-                }
-            ))
-            fig.update_layout(**PLOTLY_LAYOUT, height=300)
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # League distribution pie
-            fig = px.pie(
-                leagues_df, 
-                values='FAN_COUNT', 
-                names='LEAGUE',
-                color_discrete_sequence=[COLORS['red'], COLORS['blue'], '#FF6B00', COLORS['gold'], '#00D4FF'],
-                hole=0.4
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=300, title="League Preferences")
-            fig.update_traces(textinfo='label+percent', textfont_color='white')
-            st.plotly_chart(fig, use_container_width=True)
-        
-        # Insights
-        st.markdown("### Key Insights")
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.markdown("""
-            <div class="insight-card">
-                <div class="insight-title">🎯 Commerce Dominance</div>
-                <div class="insight-text">Commerce fans represent 91.8% of the total fan base, indicating strong e-commerce engagement.</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col2:
-            st.markdown("""
-            <div class="insight-card">
-                <div class="insight-title">🏈 NFL Leads</div>
-                <div class="insight-text">NFL is the most preferred league, 53% more fans than MLB.</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col3:
-            st.markdown("""
-            <div class="insight-card">
-                <div class="insight-title">📅 Seasonal Peaks</div>
-                <div class="insight-text">Nov-Dec shows 2-3x revenue vs other months.</div>
-            </div>
-            """, unsafe_allow_html=True)
-        
-        with col4:
-            st.markdown("""
-            <div class="insight-card">
-                <div class="insight-title">🌎 Geographic Focus</div>
-                <div class="insight-text">CA, TX, FL account for 25% of US fans.</div>
-            </div>
-            """, unsafe_allow_html=True)
-    
-    # ============== TAB 2: OPCO BREAKDOWN ==============
-    with tab2:
-        st.markdown("### Fan Count by Operating Company")
-        st.markdown("Distribution of fans across Fanatics business units")
-        
-        st.markdown("""
-        <div class="prompt-box">
-            <div class="prompt-label">FanGraph Agent Prompt</div>
-            <div class="prompt-text">"What is total number of fans in fangraph, and what's the breakdown by each OpCo?"</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        # OpCo Filter for this tab
-        selected_opco_tab2 = st.selectbox(
-            "Filter by Operating Company",
-            opco_options,
-            key="opco_tab_filter",
-            help="Select an OpCo to see detailed breakdown"
-        )
-        
-        opco_df = get_opco_breakdown()
-        opco_df_no_total = opco_df[opco_df['OPCO'] != 'Total Fans']
-        
-        if selected_opco_tab2 == "ALL":
-            # Show all OpCos
-            # KPI Cards
-            col1, col2, col3, col4 = st.columns(4)
-            
-            top_opcos = opco_df_no_total.head(4)
-            for i, (col, row) in enumerate(zip([col1, col2, col3, col4], top_opcos.itertuples())):
-                with col:
-                    st.metric(row.OPCO, format_number(row.FAN_COUNT))
-            
-            # Bar chart
-            fig = px.bar(
-                opco_df_no_total,
-                x='FAN_COUNT',
-                y='OPCO',
-                orientation='h',
-                color='FAN_COUNT',
-                color_continuous_scale=[[0, COLORS['gray']], [0.5, COLORS['red']], [1, COLORS['gold']]]
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=500, title="Fan Distribution by OpCo", showlegend=False)
-            fig.update_traces(texttemplate='%{x:.2s}', textposition='outside')
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Pie chart (excluding Commerce for better visibility)
-            opco_non_commerce = opco_df_no_total[opco_df_no_total['OPCO'] != 'Commerce']
-            fig2 = px.pie(
-                opco_non_commerce,
-                values='FAN_COUNT',
-                names='OPCO',
-                color_discrete_sequence=COLORS['gradient'][1:],
-                hole=0.4
-            )
-            fig2.update_layout(**PLOTLY_LAYOUT, height=400, title="OpCo Market Share (Excluding Commerce)")
-            fig2.update_traces(textinfo='label+percent', textfont_color='white')
-            st.plotly_chart(fig2, use_container_width=True)
-        else:
-            # Show filtered OpCo details
-            filtered_data = get_opco_filtered_stats(selected_opco_tab2)
-            
-            st.markdown(f"### {selected_opco_tab2} Deep Dive")
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("Total Fans", format_number(filtered_data['total']))
-            with col2:
-                pct_of_total = filtered_data['total'] / opco_df[opco_df['OPCO'] == 'Total Fans']['FAN_COUNT'].values[0] * 100
-                st.metric("% of Total FanGraph", f"{pct_of_total:.1f}%")
-            with col3:
-                top_league = filtered_data['leagues'].iloc[0]['LEAGUE'] if len(filtered_data['leagues']) > 0 else "N/A"
-                st.metric("Top League", top_league)
-            
-            # League breakdown for this OpCo
-            col1, col2 = st.columns(2)
-            with col1:
-                fig = px.bar(
-                    filtered_data['leagues'],
-                    x='LEAGUE',
-                    y='FAN_COUNT',
-                    color='LEAGUE',
-                    color_discrete_sequence=[COLORS['red'], COLORS['blue'], '#FF6B00', COLORS['gold'], '#00D4FF']
-                )
-                fig.update_layout(**PLOTLY_LAYOUT, height=400, title=f"League Preferences - {selected_opco_tab2}")
-                st.plotly_chart(fig, use_container_width=True)
-            
-            with col2:
-                if len(filtered_data['age']) > 0:
-                    fig = px.bar(
-                        filtered_data['age'],
-                        x='AGE_RANGE',
-                        y='FAN_COUNT',
-                        color='FAN_COUNT',
-                        color_continuous_scale=[[0, COLORS['gray']], [1, COLORS['red']]]
-                    )
-                    fig.update_layout(**PLOTLY_LAYOUT, height=400, title=f"Age Distribution - {selected_opco_tab2}")
-                    st.plotly_chart(fig, use_container_width=True)
-    
-    # ============== TAB 3: COMMERCE TRENDS ==============
-    with tab3:
-        st.markdown("### Commerce Transaction Trends")
-        st.markdown("24-month analysis of orders, revenue, and customer activity")
-        
-        st.markdown("""
-        <div class="prompt-box">
-            <div class="prompt-label">FanGraph Agent Prompt</div>
-            <div class="prompt-text">"Commerce transactions over the last 12 months compared to previous 12 months, showing product trends and sales changes"</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        commerce_df = get_commerce_trends()
-        
-        # KPIs
-        # Convert numeric columns to float (Snowflake returns Decimal)
-        commerce_df['REVENUE'] = pd.to_numeric(commerce_df['REVENUE'], errors='coerce')
-        commerce_df['ORDERS'] = pd.to_numeric(commerce_df['ORDERS'], errors='coerce')
-        commerce_df['CUSTOMERS'] = pd.to_numeric(commerce_df['CUSTOMERS'], errors='coerce')
-        
-        total_revenue = commerce_df['REVENUE'].sum()
-        total_orders = commerce_df['ORDERS'].sum()
-        avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-        peak_month = commerce_df.loc[commerce_df['REVENUE'].idxmax(), 'MONTH'].strftime('%b %Y') if len(commerce_df) > 0 else "N/A"
-        
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Total Revenue", format_number(total_revenue, '$'))
-        with col2:
-            st.metric("Total Orders", format_number(total_orders))
-        with col3:
-            st.metric("Avg Order Value", f"${avg_order_value:.2f}")
-        with col4:
-            st.metric("Peak Month", peak_month)
-        
-        # Revenue trend
-        fig = go.Figure()
-        fig.add_trace(go.Scatter(
-            x=commerce_df['MONTH'],
-            y=commerce_df['REVENUE'] / 1_000_000,
-            mode='lines+markers',
-            name='Revenue ($M)',
-            line=dict(color=COLORS['red'], width=3),
-            fill='tozeroy',
-            fillcolor='rgba(227,24,55,0.2)'
-        ))
-        fig.update_layout(**PLOTLY_LAYOUT, height=400, title="Monthly Revenue Trend")
-        fig.update_xaxes(title="Month", gridcolor='#404040')
-        fig.update_yaxes(title="Revenue ($ Millions)", gridcolor='#404040')
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Orders and Customers
-        fig2 = make_subplots(specs=[[{"secondary_y": True}]])
-        fig2.add_trace(
-            go.Bar(x=commerce_df['MONTH'], y=commerce_df['ORDERS'] / 1_000_000, name='Orders (M)', marker_color=COLORS['blue']),
-            secondary_y=False
-        )
-        fig2.add_trace(
-            go.Scatter(x=commerce_df['MONTH'], y=commerce_df['CUSTOMERS'] / 1_000_000, name='Customers (M)', line=dict(color=COLORS['gold'], width=2)),
-            secondary_y=True
-        )
-        fig2.update_layout(**PLOTLY_LAYOUT, height=400, title="Monthly Orders & Customers")
-        fig2.update_xaxes(title="Month", gridcolor='#404040')
-        fig2.update_yaxes(title="Orders (Millions)", gridcolor='#404040', secondary_y=False)
-        fig2.update_yaxes(title="Customers (Millions)", gridcolor='#404040', secondary_y=True)
-        st.plotly_chart(fig2, use_container_width=True)
+        st.markdown(f"**Last Refresh:** {format_age(get_fan_cube().attrs.get('as_of'))}")
     
-    # ============== TAB 4: NFL TEAMS ==============
-    with tab4:
-        st.markdown("### NFL Team Fan Distribution")
-        st.markdown("Top 15 NFL teams by fan preference count")
-        
-        st.markdown("""
-        <div class="prompt-box">
-            <div class="prompt-label">FanGraph Agent Prompt</div>
-            <div class="prompt-text">"What's the trend of NFL fans purchasing jerseys over the last 4 years? Show top teams by fan count."</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        nfl_df = get_nfl_teams()
-        leagues_df = get_league_preferences()
-        total_nfl_fans = leagues_df[leagues_df['LEAGUE'] == 'NFL']['FAN_COUNT'].values[0]
-        
-        # KPIs
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("#1 " + nfl_df.iloc[0]['NFL_TEAM'], format_number(nfl_df.iloc[0]['FAN_COUNT']))
-        with col2:
-            st.metric("#2 " + nfl_df.iloc[1]['NFL_TEAM'], format_number(nfl_df.iloc[1]['FAN_COUNT']))
-        with col3:
-            st.metric("#3 " + nfl_df.iloc[2]['NFL_TEAM'], format_number(nfl_df.iloc[2]['FAN_COUNT']))
-        with col4:
-            st.metric("#4 " + nfl_df.iloc[3]['NFL_TEAM'], format_number(nfl_df.iloc[3]['FAN_COUNT']))
-        
-        # Bar chart
-        colors_list = [COLORS['green'] if i == 0 else (COLORS['red'] if i < 3 else COLORS['blue']) for i in range(len(nfl_df))]
-        fig = px.bar(
-            nfl_df,
-            x='NFL_TEAM',
-            y='FAN_COUNT',
-            color='NFL_TEAM',
-            color_discrete_sequence=colors_list
+    # Tab navigation - lazy mode only builds the tab that is open
+    if LAZY_TABS:
+        active_tab = st.radio(
+            "Section",
+            tab_labels,
+            horizontal=True,
+            key="active_tab",
+            label_visibility="collapsed"
         )
-        fig.update_layout(**PLOTLY_LAYOUT, height=500, title="NFL Teams by Fan Count", showlegend=False)
-        fig.update_xaxes(tickangle=-45)
-        st.plotly_chart(fig, use_container_width=True)
-        
-        # Data table
-        st.markdown("### Top 15 NFL Teams")
-        nfl_df['% of NFL Fans'] = (nfl_df['FAN_COUNT'] / total_nfl_fans * 100).round(1).astype(str) + '%'
-        nfl_df['Fan Count'] = nfl_df['FAN_COUNT'].apply(lambda x: format_number(x))
-        st.dataframe(
-            nfl_df[['NFL_TEAM', 'Fan Count', '% of NFL Fans']].rename(columns={'NFL_TEAM': 'Team'}),
-            use_container_width=True,
-            hide_index=True
-        )
-    
-    # ============== TAB 5: DEMOGRAPHICS ==============
-    with tab5:
-        st.markdown("### Fan Demographics")
-        st.markdown("Age distribution and geographic analysis of the fan base")
-        
-        st.markdown("""
-        <div class="prompt-box">
-            <div class="prompt-label">FanGraph Agent Prompt</div>
-            <div class="prompt-text">"Tell me about the demographic profile of fans - their age, location, and other characteristics"</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        age_df = get_age_demographics()
-        geo_df = get_geo_data()
-        
-        # KPIs
-        col1, col2, col3, col4 = st.columns(4)
-        with col1:
-            st.metric("Largest Age Group", age_df.iloc[0]['AGE_RANGE'], delta=format_number(age_df.iloc[0]['FAN_COUNT']))
-        with col2:
-            st.metric("Top State", geo_df.iloc[0]['STATE'], delta=format_number(geo_df.iloc[0]['FAN_COUNT']))
-        with col3:
-            total_with_age = age_df['FAN_COUNT'].sum()
-            st.metric("Fans with Age Data", format_number(total_with_age))
-        with col4:
-            top3_states = geo_df.head(3)['FAN_COUNT'].sum()
-            total_fans = get_total_fans()
-            st.metric("Top 3 States Share", f"{top3_states/total_fans*100:.0f}%")
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Age chart
-            fig = px.bar(
-                age_df,
-                x='AGE_RANGE',
-                y='FAN_COUNT',
-                color='FAN_COUNT',
-                color_continuous_scale=[[0, COLORS['gray']], [1, COLORS['red']]]
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=400, title="Age Distribution")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Geo chart
-            fig = px.bar(
-                geo_df,
-                x='STATE',
-                y='FAN_COUNT',
-                color='FAN_COUNT',
-                color_continuous_scale=[[0, '#404040'], [0.5, COLORS['red']], [1, COLORS['gold']]]
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=400, title="Top 20 States by Fan Count")
-            st.plotly_chart(fig, use_container_width=True)
-    
-    # ============== TAB 6: LEAGUE PREFERENCES ==============
-    with tab6:
-        st.markdown("### League Preference Analysis")
-        st.markdown("Fan distribution across major sports leagues")
-        
-        st.markdown("""
-        <div class="prompt-box">
-            <div class="prompt-label">FanGraph Agent Prompt</div>
-            <div class="prompt-text">"Yearly breakdown of fans by league preference for NBA, NFL, MLB, NHL and NCAA"</div>
-        </div>
-        """, unsafe_allow_html=True)
-        
-        leagues_df = get_league_preferences()
-        
-        # KPIs
-        col1, col2, col3, col4 = st.columns(4)
-        for i, col in enumerate([col1, col2, col3, col4]):
-            if i < len(leagues_df):
-                with col:
-                    st.metric(
-                        f"#{i+1} {leagues_df.iloc[i]['LEAGUE']}", 
-                        format_number(leagues_df.iloc[i]['FAN_COUNT'])
-                    )
-        
-        col1, col2 = st.columns(2)
-        
-        with col1:
-            # Bar chart
-            fig = px.bar(
-                leagues_df,
-                x='LEAGUE',
-                y='FAN_COUNT',
-                color='LEAGUE',
-                color_discrete_sequence=[COLORS['red'], COLORS['blue'], '#FF6B00', COLORS['gold'], '#00D4FF']
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=450, title="League Fan Distribution")
-            st.plotly_chart(fig, use_container_width=True)
-        
-        with col2:
-            # Pie chart
-            fig = px.pie(
-                leagues_df,
-                values='FAN_COUNT',
-                names='LEAGUE',
-                color_discrete_sequence=[COLORS['red'], COLORS['blue'], '#FF6B00', COLORS['gold'], '#00D4FF'],
-                hole=0.35
-            )
-            fig.update_layout(**PLOTLY_LAYOUT, height=450, title="League Comparison")
-            fig.update_traces(textinfo='label+percent', textfont_color='white')
-            st.plotly_chart(fig, use_container_width=True)
+        with span(active_tab, "tab", tab=active_tab):
+            TABS[active_tab]()
+    else:
+        for tab, label in zip(st.tabs(tab_labels), tab_labels):
+            with tab, span(label, "tab", tab=label):
+                TABS[label]()
     
     # Footer
     st.divider()
@@ -0,0 +1,103 @@
+"""Materialized summary tables stored as local Parquet files.
+
+``build_summaries.py`` runs the dashboard's base queries once and writes
+each result to ``<FANGRAPH_SUMMARY_DIR>/<name>.parquet``, stamped with its
+build time and a hash of the SQL (and parameters) that produced it. ``run_query`` then
+answers queries tagged with a summary name from those files - a few
+kilobytes of local reads instead of a warehouse scan - and falls back to the
+live query when the file is missing, older than FANGRAPH_SUMMARY_MAX_AGE
+hours, or was built from different SQL.
+"""
+import datetime
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import normalize_sql
+
+SUMMARY_DIR = Path(os.environ.get("FANGRAPH_SUMMARY_DIR", "summaries"))
+SUMMARY_MAX_AGE_HOURS = float(os.environ.get("FANGRAPH_SUMMARY_MAX_AGE", "24"))
+USE_SUMMARIES = os.environ.get("FANGRAPH_SUMMARIES", "1") != "0"
+
+_building = threading.Event()
+
+
+def sql_hash(sql, params=()):
+    return hashlib.sha1(json.dumps([normalize_sql(sql), list(params)], default=str).encode()).hexdigest()
+
+
+@contextmanager
+def build_mode():
+    """While active, tagged queries run live and their results are written as summaries"""
+    _building.set()
+    try:
+        yield
+    finally:
+        _building.clear()
+
+
+def building():
+    return _building.is_set()
+
+
+def summary_path(name, directory=None):
+    return Path(directory or SUMMARY_DIR) / f"{name}.parquet"
+
+
+def write_summary(name, sql, df, directory=None, params=()):
+    """Atomically write ``df`` as summary ``name`` stamped with the build time and SQL hash"""
+    path = summary_path(name, directory)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    built_at = datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        b"fangraph_built_at": built_at.encode(),
+        b"fangraph_sql_hash": sql_hash(sql, params).encode(),
+    })
+    tmp = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    pq.write_table(table, tmp)
+    os.replace(tmp, path)
+    return path, built_at
+
+
+def summary_info(name, directory=None):
+    """Build time and SQL hash of summary ``name``, or None if it has not been built"""
+    path = summary_path(name, directory)
+    if not path.exists():
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    return {
+        "built_at": datetime.datetime.fromisoformat(metadata.get(b"fangraph_built_at", b"").decode()),
+        "sql_hash": metadata.get(b"fangraph_sql_hash", b"").decode(),
+        "bytes": path.stat().st_size,
+    }
+
+
+def clear(directory=None):
+    """Delete every summary (and the monthly histories kept as summaries)"""
+    for path in Path(directory or SUMMARY_DIR).glob("*.parquet"):
+        path.unlink(missing_ok=True)
+
+
+def read_summary(name, sql, max_age_hours=None, directory=None, params=()):
+    """Summary ``name`` as a DataFrame if it is fresh and was built from ``sql``, else None"""
+    try:
+        info = summary_info(name, directory)
+    except (OSError, ValueError, pa.ArrowInvalid):
+        return None
+    if info is None or info["sql_hash"] != sql_hash(sql, params):
+        return None
+    max_age = SUMMARY_MAX_AGE_HOURS if max_age_hours is None else max_age_hours
+    age = datetime.datetime.now(datetime.timezone.utc) - info["built_at"]
+    if max_age and age > datetime.timedelta(hours=max_age):
+        return None
+    df = pq.read_table(summary_path(name, directory)).to_pandas(split_blocks=True, self_destruct=True)
+    df.attrs["built_at"] = info["built_at"]
+    return df
@@ -0,0 +1,262 @@
+"""Stale-while-revalidate caching for the dashboard getters.
+
+A drop-in for ``st.cache_data(ttl=..., show_spinner=...)``. Within ``ttl`` a
+cached result is returned as usual. Once it expires it is still returned
+immediately, and a single background worker recomputes it, so no viewer
+waits on a warehouse scan because an hour has passed. Only results older
+than ``ttl + max_stale`` (or never computed) are loaded in the foreground.
+
+Calls are coalesced per function and arguments: while a load or refresh
+is in flight, other sessions asking for the same result wait for it
+instead of starting their own. Like ``st.cache_data``, each caller gets
+its own copy of the result.
+
+A getter built on other cached getters is stamped with the oldest of their
+fetch times, so it never counts as fresher than the data it was built
+from. A background refresh first refreshes any expired getter it builds
+on, inline on the same worker; a refresh still queued when someone needs
+its result is likewise taken over and run by the caller.
+
+Each entry remembers the source tables and data time behind it (see
+``invalidation``), so ``invalidate`` can refresh just the entries whose
+tables changed.
+
+Getters called inside ``quiet_context()`` show no spinner: worker threads
+must not write to the page.
+
+FANGRAPH_STALE_WHILE_REVALIDATE=0 falls back to plain ``st.cache_data``.
+"""
+import contextvars
+import copy
+import functools
+import inspect
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import nullcontext
+
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+from invalidation import collect_sources, record
+
+SWR_ENABLED = os.environ.get("FANGRAPH_STALE_WHILE_REVALIDATE", "1") != "0"
+# Seconds past the ttl a result may still be served while it refreshes
+MAX_STALE = float(os.environ.get("FANGRAPH_MAX_STALE", "86400"))
+
+logger = logging.getLogger(__name__)
+
+# One worker: background refreshes run one at a time, never as a stampede.
+# Nested refreshes run inline, so the worker never waits on its own queue.
+_refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fangraph-refresh")
+# The load in progress in this context, if any
+_current_load = contextvars.ContextVar("fangraph_swr_load", default=None)
+# Off in worker threads: Streamlit's page writes are not thread-safe
+_show_spinners = contextvars.ContextVar("fangraph_swr_spinners", default=True)
+# Function identity -> its cache. Streamlit re-executes the script (and so
+# these decorators) on every rerun; the cache must outlive that.
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _Entry:
+    __slots__ = ("value", "fetched_at", "sources")
+
+    def __init__(self, value, fetched_at, sources):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.sources = sources
+
+
+class _Load:
+    """A getter being computed: whether it is a background refresh, and the oldest upstream fetch time"""
+    __slots__ = ("background", "oldest")
+
+    def __init__(self, background):
+        self.background = background
+        self.oldest = None
+
+    def used(self, entry):
+        self.oldest = entry.fetched_at if self.oldest is None else min(self.oldest, entry.fetched_at)
+
+
+class _Store:
+    """Cached entries and in-flight loads of one function"""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.entries = {}
+        self.inflight = {}
+        # key -> queued background refresh, cancelled if a caller takes it over
+        self.tasks = {}
+        self.lock = threading.Lock()
+
+    def load(self, key, args, kwargs, future, background=False):
+        """Compute the function and publish the result to the cache and every waiter"""
+        current = _Load(background)
+        token = _current_load.set(current)
+        try:
+            with collect_sources() as sources:
+                value = self.fn(*args, **kwargs)
+        except BaseException as exc:
+            with self.lock:
+                self.inflight.pop(key, None)
+                self.tasks.pop(key, None)
+            future.set_exception(exc)
+            raise
+        finally:
+            _current_load.reset(token)
+        # No fresher than the oldest cached result it was built from
+        fetched_at = time.time() if current.oldest is None else min(time.time(), current.oldest)
+        entry = _Entry(value, fetched_at, sources)
+        with self.lock:
+            self.entries[key] = entry
+            self.inflight.pop(key, None)
+            self.tasks.pop(key, None)
+        future.set_result(entry)
+        return entry
+
+    def refresh(self, key, args, kwargs, future):
+        try:
+            self.load(key, args, kwargs, future, background=True)
+        except Exception:
+            logger.exception("Background refresh of %s failed; serving the stale result", self.fn.__name__)
+
+    def submit_refresh(self, key):
+        """Queue a background refresh of ``key`` - call with the lock held"""
+        self.inflight[key] = future = Future()
+        self.tasks[key] = _refresher.submit(self.refresh, key, key[0], dict(key[1]), future)
+
+    def take_over(self, key):
+        """Cancel the queued refresh of ``key`` so the caller runs it - call with the lock held"""
+        task = self.tasks.get(key)
+        return task is not None and task.cancel()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def invalidate(self, is_stale):
+        """Refresh in the background every entry where ``is_stale(tables, as_of)``"""
+        with self.lock:
+            stale = [
+                key for key, entry in self.entries.items()
+                if key not in self.inflight and is_stale(entry.sources.tables, entry.sources.as_of)
+            ]
+            for key in stale:
+                self.submit_refresh(key)
+        return len(stale)
+
+    def source_tables(self):
+        with self.lock:
+            return set().union(*(entry.sources.tables for entry in self.entries.values()))
+
+
+def _key(args, kwargs):
+    return args, tuple(sorted(kwargs.items()))
+
+
+def _store_for(fn):
+    """The store shared by every (re)definition of ``fn`` with the same code"""
+    code = inspect.unwrap(fn).__code__
+    identity = (fn.__module__, fn.__qualname__, code.co_code, code.co_consts)
+    with _stores_lock:
+        store = _stores.get(identity)
+        if store is None:
+            store = _stores[identity] = _Store(fn)
+        store.fn = fn
+        return store
+
+
+def quiet_context():
+    """A copy of the current context in which cached getters show no spinner"""
+    ctx = contextvars.copy_context()
+    ctx.run(_show_spinners.set, False)
+    return ctx
+
+
+def _cache_data(ttl, show_spinner):
+    """``st.cache_data`` that honours ``quiet_context``.
+
+    Both wrappers share one cache: st.cache_data keys it by the function,
+    not by the spinner setting.
+    """
+    def decorate(fn):
+        loud = st.cache_data(ttl=ttl, show_spinner=show_spinner)(fn)
+        quiet = st.cache_data(ttl=ttl, show_spinner=False)(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return (loud if _show_spinners.get() else quiet)(*args, **kwargs)
+
+        wrapper.clear = loud.clear
+        return wrapper
+    return decorate
+
+
+def swr_cache(ttl, show_spinner=False, max_stale=MAX_STALE):
+    """Decorator caching results for ``ttl`` seconds, then serving them stale while refreshing"""
+    if not SWR_ENABLED:
+        return _cache_data(ttl, show_spinner)
+
+    def decorate(fn):
+        store = _store_for(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            key = _key(args, kwargs)
+            current = _current_load.get()
+            background = current is not None and current.background
+            # A background refresh refreshes the expired getters it builds on first
+            limit = ttl if background else ttl + max_stale
+            with store.lock:
+                entry = store.entries.get(key)
+                usable = entry is not None and time.time() - entry.fetched_at < limit
+                if usable:
+                    if time.time() - entry.fetched_at >= ttl and key not in store.inflight:
+                        store.submit_refresh(key)
+                else:
+                    future = store.inflight.get(key)
+                    owner = future is None or store.take_over(key)
+                    if future is None:
+                        store.inflight[key] = future = Future()
+            if not usable and not owner:
+                entry = future.result()
+            elif not usable:
+                visible = show_spinner and _show_spinners.get() and get_script_run_ctx()
+                spinner = st.spinner(show_spinner) if visible else nullcontext()
+                with spinner:
+                    entry = store.load(key, args, kwargs, future, background)
+            # A getter built on this one inherits its sources and fetch time
+            record(entry.sources.tables, entry.sources.as_of)
+            if current is not None:
+                current.used(entry)
+            return copy.deepcopy(entry.value)
+
+        wrapper.clear = store.clear
+        return wrapper
+    return decorate
+
+
+def _all_stores():
+    with _stores_lock:
+        return list(_stores.values())
+
+
+def clear_all():
+    """Drop every stale-while-revalidate cache (and st.cache_data)"""
+    st.cache_data.clear()
+    for store in _all_stores():
+        store.clear()
+
+
+def invalidate(is_stale):
+    """Background-refresh the entries of every cache where ``is_stale(tables, as_of)``; returns how many"""
+    return sum(store.invalidate(is_stale) for store in _all_stores())
+
+
+def source_tables():
+    """Every source table behind a cached result"""
+    return set().union(*(store.source_tables() for store in _all_stores()))
@@ -0,0 +1,43 @@
+"""Keyset cursors of the fan drill-down for integer, NUMBER(38) and VARCHAR IDs."""
+from decimal import Decimal
+
+import pandas as pd
+import pytest
+
+import drilldown
+
+WIDE = 12345678901234567890123456789
+
+
+def pager(ids):
+    """A ``run_query`` paging through ``ids`` in order, honouring the keyset bound and LIMIT"""
+    calls = []
+
+    def run_query(sql, params):
+        calls.append(params)
+        rows = ids[ids > params[-1]] if "FANGRAPH_ID > ?" in sql else ids
+        limit = int(sql.rsplit("LIMIT", 1)[1])
+        return pd.DataFrame({"FANGRAPH_ID": rows.head(limit).reset_index(drop=True)})
+
+    return run_query, calls
+
+
+@pytest.mark.parametrize("ids, cursor_type", [
+    (pd.Series([1, 2, 3, 4, 5], dtype="int64"), int),
+    (pd.Series([Decimal(WIDE + i) for i in range(5)], dtype=object), Decimal),
+    (pd.Series(["fan-a", "fan-b", "fan-c", "fan-d", "fan-e"], dtype=object), str),
+])
+def test_cursor_keeps_raw_id(ids, cursor_type):
+    run_query, calls = pager(ids)
+    first = drilldown.fetch_page(run_query, [], page_size=2)
+    assert first.has_next
+    assert type(first.next_after) is cursor_type
+    assert first.next_after == ids[1]
+
+    second = drilldown.fetch_page(run_query, [], first.next_after, page_size=2)
+    assert calls[-1][-1] == ids[1]
+    assert list(second.rows["FANGRAPH_ID"]) == list(ids[2:4])
+
+    last = drilldown.fetch_page(run_query, [], second.next_after, page_size=2)
+    assert not last.has_next and last.next_after is None
+    assert list(last.rows["FANGRAPH_ID"]) == list(ids[4:])